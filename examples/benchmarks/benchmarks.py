@@ -0,0 +1,225 @@
+"""
+benchmarks.py
+Measure the duration of the FC and UNet hot paths on CPU and save the results in a JSON file.
+Run 'python benchmarks.py --help' to get the list of parameters.
+"""
+
+# Python related
+from typing import Any, Callable, Dict, List
+from argparse import ArgumentParser
+from json import dump
+from time import perf_counter
+from datetime import datetime
+from platform import platform, python_version, processor
+from numpy import array, percentile
+from numpy.random import random
+import torch
+
+# DeepPhysX's PyTorch imports
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+from DeepPhysX.Torch.UNet.UNetConfig import UNetConfig
+from DeepPhysX.Torch.Network.TorchCpuPolicy import TorchCpuPolicy
+
+
+def statistics(durations: List[float],
+               batch_size: int) -> Dict[str, float]:
+    """
+    Compute the statistics of a list of durations.
+
+    :param durations: Durations in seconds.
+    :param batch_size: Number of samples processed in each duration.
+    :return: Mean, standard deviation and percentiles in milliseconds, throughput in samples per second.
+    """
+
+    durations = array(durations) * 1e3
+    return {'mean_ms': float(durations.mean()),
+            'std_ms': float(durations.std()),
+            'min_ms': float(durations.min()),
+            'p50_ms': float(percentile(durations, 50)),
+            'p90_ms': float(percentile(durations, 90)),
+            'p99_ms': float(percentile(durations, 99)),
+            'throughput': float(batch_size * 1e3 / percentile(durations, 50))}
+
+
+def measure(function: Callable[[], Dict[str, float]],
+            warmup: int,
+            repetitions: int,
+            batch_size: int) -> Dict[str, Dict[str, float]]:
+    """
+    Run a function several times after a warmup. The function returns the duration of each of its phases.
+
+    :param function: Function to benchmark, returns a dict of phase durations in seconds.
+    :param warmup: Number of runs before measuring.
+    :param repetitions: Number of measured runs.
+    :param batch_size: Number of samples processed by the function.
+    :return: Statistics of each phase.
+    """
+
+    for _ in range(warmup):
+        function()
+    durations: Dict[str, List[float]] = {}
+    for _ in range(repetitions):
+        for phase, duration in function().items():
+            durations.setdefault(phase, []).append(duration)
+    return {phase: statistics(phase_durations, batch_size) for phase, phase_durations in durations.items()}
+
+
+def timed(function: Callable[[], Any]) -> Callable[[], Dict[str, float]]:
+    """
+    Wrap a function to return its duration as a single phase.
+
+    :param function: Function to benchmark.
+    :return: Function returning its duration.
+    """
+
+    def inner() -> Dict[str, float]:
+        start = perf_counter()
+        function()
+        return {'total': perf_counter() - start}
+
+    return inner
+
+
+def benchmark_network(config: Any,
+                      input_shape: List[int],
+                      output_shape: List[int],
+                      batch_size: int,
+                      warmup: int,
+                      repetitions: int) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the prediction, the training step and the conversions of a Network with its transformation.
+
+    :param config: Network configuration.
+    :param input_shape: Shape of an input sample as given to the Network.
+    :param output_shape: Shape of a ground truth sample as given to the Optimization.
+    :param batch_size: Number of samples in a batch.
+    :param warmup: Number of runs before measuring.
+    :param repetitions: Number of measured runs.
+    :return: Statistics of each benchmark.
+    """
+
+    network = config.create_network()
+    transformation = config.create_data_transformation()
+    optimization = config.create_optimization()
+    optimization.set_loss()
+    input_array = random((batch_size, *input_shape))
+    ground_truth_array = random((batch_size, *output_shape))
+    results = {}
+
+    # Conversions between arrays and tensors
+    input_tensor = network.numpy_to_tensor(data=input_array, grad=False)
+    results['numpy_to_tensor'] = measure(timed(lambda: network.numpy_to_tensor(data=input_array, grad=False)),
+                                         warmup, repetitions, batch_size)
+    results['tensor_to_numpy'] = measure(timed(lambda: network.tensor_to_numpy(data=input_tensor)),
+                                         warmup, repetitions, batch_size)
+
+    # Transformations
+    data_net = transformation.transform_before_prediction({'input': input_tensor})
+    prediction = network.predict(data_net)
+    results['transform_before_prediction'] = measure(
+        timed(lambda: transformation.transform_before_prediction({'input': input_tensor})),
+        warmup, repetitions, batch_size)
+    results['transform_before_loss'] = measure(
+        timed(lambda: transformation.transform_before_loss(
+            dict(prediction), {'ground_truth': network.numpy_to_tensor(data=ground_truth_array, grad=False)})),
+        warmup, repetitions, batch_size)
+
+    # Prediction in eval mode
+    network.set_eval()
+    results['predict'] = measure(timed(lambda: network.predict(data_net)), warmup, repetitions, batch_size)
+
+    # Training step, measured by phase
+    network.set_train()
+    optimization.set_optimizer(network)
+
+    def training_step() -> Dict[str, float]:
+        start = perf_counter()
+        data_pred = network.predict(transformation.transform_before_prediction(
+            {'input': network.numpy_to_tensor(data=input_array, grad=True)}))
+        data_pred, data_opt = transformation.transform_before_loss(
+            data_pred, {'ground_truth': network.numpy_to_tensor(data=ground_truth_array, grad=False)})
+        optimization.compute_loss(data_pred, data_opt)
+        forward_end = perf_counter()
+        optimization.backward(optimization.loss_value)
+        backward_end = perf_counter()
+        optimization.step()
+        step_end = perf_counter()
+        return {'forward': forward_end - start,
+                'backward': backward_end - forward_end,
+                'optimizer_step': step_end - backward_end,
+                'total': step_end - start}
+
+    results['training_step'] = measure(training_step, warmup, repetitions, batch_size)
+    return results
+
+
+def main():
+
+    parser = ArgumentParser(description='Benchmark of the FC and UNet hot paths on CPU.')
+    parser.add_argument('--suites', nargs='+', default=['fc', 'unet'], choices=['fc', 'unet'],
+                        help='Architectures to benchmark.')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 16], help='Batch sizes.')
+    parser.add_argument('--fc-layers', nargs='+', type=int, default=[300, 300, 300, 300], help='FC layers sizes.')
+    parser.add_argument('--grid-sizes', nargs='+', type=int, default=[16, 32], help='UNet grid sizes (cubic grids).')
+    parser.add_argument('--nb-steps', nargs='+', type=int, default=[2, 3], help='UNet numbers of steps.')
+    parser.add_argument('--data-types', nargs='+', default=['float32'], choices=['float32', 'float64'],
+                        help='Data types.')
+    parser.add_argument('--threads', nargs='+', type=int, default=None,
+                        help='Numbers of CPU threads, all the available CPUs by default.')
+    parser.add_argument('--warmup', type=int, default=3, help='Number of runs before measuring.')
+    parser.add_argument('--repetitions', type=int, default=20, help='Number of measured runs.')
+    parser.add_argument('--output', type=str, default='benchmarks.json', help='Path of the JSON results file.')
+    args = parser.parse_args()
+    threads = [TorchCpuPolicy.available_cpus()] if args.threads is None else args.threads
+
+    # Cases are the combinations of the parameters
+    cases = []
+    for data_type in args.data_types:
+        for nb_threads in threads:
+            for batch_size in args.batch_sizes:
+                if 'fc' in args.suites:
+                    cases.append({'architecture': 'FC', 'data_type': data_type, 'threads': nb_threads,
+                                  'batch_size': batch_size, 'layers': args.fc_layers})
+                if 'unet' in args.suites:
+                    for grid_size in args.grid_sizes:
+                        for nb_steps in args.nb_steps:
+                            cases.append({'architecture': 'UNet', 'data_type': data_type, 'threads': nb_threads,
+                                          'batch_size': batch_size, 'grid_size': grid_size, 'nb_steps': nb_steps})
+
+    results = []
+    for case in cases:
+        torch.set_num_threads(case['threads'])
+        if case['architecture'] == 'FC':
+            config = FCConfig(dim_layers=case['layers'], dim_output=3, data_type=case['data_type'],
+                              loss=torch.nn.MSELoss, optimizer=torch.optim.Adam, lr=1e-4)
+            input_shape, output_shape = [case['layers'][0] // 3, 3], [case['layers'][-1] // 3, 3]
+        else:
+            grid_size = case['grid_size']
+            config = UNetConfig(input_size=[grid_size] * 3, nb_dims=3, nb_input_channels=3, nb_first_layer_channels=8,
+                                nb_output_channels=3, nb_steps=case['nb_steps'], border_mode='same',
+                                data_type=case['data_type'], loss=torch.nn.MSELoss, optimizer=torch.optim.Adam,
+                                lr=1e-4)
+            input_shape = output_shape = [grid_size ** 3 * 3]
+        print(f"Benchmark {case}")
+        case_results = benchmark_network(config, input_shape, output_shape, case['batch_size'], args.warmup,
+                                         args.repetitions)
+        for benchmark, phases in case_results.items():
+            print(f"    {benchmark}: {phases['total']['p50_ms']:.3f} ms")
+        results.append({'case': case, 'results': case_results})
+
+    # Save the results with the environment description
+    metadata = {'date': datetime.now().isoformat(),
+                'torch': torch.__version__,
+                'python': python_version(),
+                'platform': platform(),
+                'processor': processor(),
+                'available_cpus': TorchCpuPolicy.available_cpus(),
+                'warmup': args.warmup,
+                'repetitions': args.repetitions}
+    with open(args.output, 'w') as file:
+        dump({'metadata': metadata, 'benchmarks': results}, file, indent=2)
+    print(f"Results saved in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
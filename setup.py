@@ -35,4 +35,6 @@ setup(name=f'{PROJECT}.{PACKAGE}',
       package_dir=packages_dir,
       namespace_packages=[PROJECT],
       install_requires=['DeepPhysX >= 22.12',
-                        'torch >= 1.13.0'])
+                        'torch >= 2.3.0'],
+      extras_require={'onnx': ['onnx', 'onnxruntime'],
+                      'test': ['onnx', 'onnxruntime', 'safetensors']})
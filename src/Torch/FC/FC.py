@@ -1,5 +1,8 @@
-from torch import Tensor
-from torch.nn import Sequential, PReLU, Linear
+from typing import List, Optional, Tuple, Union
+from torch import Tensor, addmm, mm, clamp, cat, empty, is_grad_enabled, is_autocast_enabled, \
+    is_inference_mode_enabled, jit
+from torch.nn import Module, Sequential, PReLU, Linear
+from torch.compiler import is_compiling
 from collections import namedtuple
 
 from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
@@ -22,22 +25,37 @@ class FC(TorchNetwork):
         self.opt_fields = ['ground_truth']
         self.pred_fields = ['prediction']
 
+        # Init the layers
+        self.layers = self.create_layers(self.config.dim_layers, self.config.biases)
+        self.linear = Sequential(*self.layers)
+
+        # Fused inference: reusable workspaces, the parameters are stacked in stacked_parameters
+        self.fused_workspaces: List[Tensor] = []
+        self.fused_width: int = max(self.config.dim_layers[1:-1], default=0)
+
+    @staticmethod
+    def create_layers(dim_layers: List[int],
+                      biases: Union[List[bool], bool]) -> List[Module]:
+        """
+        Create the sequence of Linear layers with PReLU activations between them.
+
+        :param dim_layers: Size of each layer of the network.
+        :param biases: Layers should have biases or not, either for all layers or for each layer.
+        :return: List of layers.
+        """
+
         # Convert biases to a List if not already one
-        biases = None
-        if isinstance(config.biases, list):
-            if len(config.biases) != len(self.config.dim_layers) - 1:
+        if isinstance(biases, list):
+            if len(biases) != len(dim_layers) - 1:
                 raise ValueError("Biases list length does not match layers count")
-            biases = config.biases
         else:
-            biases = [config.biases] * (len(self.config.dim_layers) - 1)
+            biases = [biases] * (len(dim_layers) - 1)
 
-        # Init the layers
-        self.layers = []
+        layers = []
         for i, bias in enumerate(biases):
-            self.layers.append(Linear(self.config.dim_layers[i], self.config.dim_layers[i + 1], bias))
-            self.layers.append(PReLU(num_parameters=self.config.dim_layers[i + 1]))
-        self.layers = self.layers[:-1]
-        self.linear = Sequential(*self.layers)
+            layers.append(Linear(dim_layers[i], dim_layers[i + 1], bias))
+            layers.append(PReLU(num_parameters=dim_layers[i + 1]))
+        return layers[:-1]
 
     def forward(self,
                 input_data: Tensor) -> Tensor:
@@ -48,8 +66,96 @@ class FC(TorchNetwork):
         :return: Network prediction.
         """
 
-        res = self.linear(input_data.view(input_data.shape[0], -1)).view(input_data.shape[0], -1,
-                                                                         self.config.dim_output)
+        if self.fused_inference_enabled(input_data):
+            res = self.fused_forward(input_data.view(input_data.shape[0], -1))
+        else:
+            res = self.linear(input_data.view(input_data.shape[0], -1))
+        return res.view(input_data.shape[0], -1, self.config.dim_output)
+
+    def fused_inference_enabled(self,
+                                input_data: Tensor) -> bool:
+        """
+        Check if the forward pass can be computed with the fused implementation. It is only used for predictions
+        without gradients, mixed precision, quantization or graph capture.
+
+        :param input_data: Input tensor.
+        :return: True if the fused implementation can be used.
+        """
+
+        return self.config.fused_inference and not self.training and not is_grad_enabled() and \
+            self.quantization is None and not is_autocast_enabled(input_data.device.type) and \
+            not jit.is_tracing() and not is_compiling()
+
+    def stack_fused_layers(self) -> List[Tuple[Tensor, Optional[Tensor], Optional[Tensor]]]:
+        """
+        Stack the transposed weights, the biases and the activation slopes in a single contiguous buffer.
+
+        :return: Views on the buffer of the transposed weights, biases and activation slopes minus one of each layer.
+        """
+
+        # A PReLU with slope a is computed as x + (a - 1) * min(x, 0)
+        linears = [layer for layer in self.layers if isinstance(layer, Linear)]
+        slopes = [layer.weight.detach() - 1 for layer in self.layers if isinstance(layer, PReLU)] + [None]
+        tensors = []
+        for linear, slope in zip(linears, slopes):
+            tensors += [linear.weight.detach().t(), linear.bias, slope]
+        tensors = [None if tensor is None else tensor.detach() for tensor in tensors]
+        stacked = cat([tensor.reshape(-1) for tensor in tensors if tensor is not None])
+
+        # Layers parameters are views on the stacked buffer
+        views, offset = [], 0
+        for tensor in tensors:
+            if tensor is None:
+                views.append(None)
+            else:
+                views.append(stacked[offset:offset + tensor.numel()].view(tensor.shape))
+                offset += tensor.numel()
+        return [tuple(views[i:i + 3]) for i in range(0, len(views), 3)]
+
+    def get_fused_workspaces(self,
+                             input_data: Tensor) -> List[Tensor]:
+        """
+        Get the workspaces for the intermediate layers, allocated for the largest batch size met so far.
+
+        :param input_data: Input tensor.
+        :return: Two workspaces for the layers outputs and one for the activations.
+        """
+
+        size = input_data.shape[0] * self.fused_width
+        workspace = self.fused_workspaces[0] if len(self.fused_workspaces) > 0 else None
+        if workspace is None or workspace.numel() < size or workspace.dtype != input_data.dtype or \
+                workspace.device != input_data.device or workspace.is_inference() != is_inference_mode_enabled():
+            self.fused_workspaces = [empty(size, dtype=input_data.dtype, device=input_data.device) for _ in range(3)]
+        return self.fused_workspaces
+
+    def fused_forward(self,
+                      input_data: Tensor) -> Tensor:
+        """
+        Compute the forward pass with one matrix product and one fused activation per layer. Intermediate results are
+        written in reused workspaces, so this method must not be called concurrently on the same Network.
+
+        :param input_data: Flattened input tensor.
+        :return: Flattened Network prediction, in a new tensor.
+        """
+
+        fused_layers = self.get_stacked_parameters(self.stack_fused_layers)
+        workspaces = self.get_fused_workspaces(input_data)
+        nb_samples, res = input_data.shape[0], input_data
+        for i, (weight, bias, slope) in enumerate(fused_layers):
+            shape = (nb_samples, weight.shape[1])
+            if i == len(fused_layers) - 1:
+                output = empty(shape, dtype=res.dtype, device=res.device)
+            else:
+                output = workspaces[i % 2][:shape[0] * shape[1]].view(shape)
+            if bias is None:
+                mm(res, weight, out=output)
+            else:
+                addmm(bias, res, weight, out=output)
+            if slope is not None:
+                negative = workspaces[2][:shape[0] * shape[1]].view(shape)
+                clamp(output, max=0, out=negative)
+                output.addcmul_(negative, slope)
+            res = output
         return res
 
     def __str__(self):
@@ -58,4 +164,5 @@ class FC(TorchNetwork):
         description += self.linear.__str__() + "\n"
         description += f"    Layers dimensions: {self.config.dim_layers}\n"
         description += f"    Output dimension: {self.config.dim_output}\n"
+        description += f"    Fused inference: {self.config.fused_inference}\n"
         return description
@@ -1,4 +1,4 @@
-from typing import Any, Optional, Type, Union, List
+from typing import Any, Optional, Type, Union, List, Dict
 
 from DeepPhysX.Core.Utils.configs import make_config
 from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig, TorchTransformation, TorchOptimization
@@ -21,7 +21,27 @@ class FCConfig(TorchNetworkConfig):
                  optimizer: Any = None,
                  dim_output: int = 0,
                  dim_layers: list = None,
-                 biases: Union[List[bool], bool] = True):
+                 biases: Union[List[bool], bool] = True,
+                 fused_inference: bool = False,
+                 mixed_precision: Optional[str] = None,
+                 buffer_pool: bool = False,
+                 compile_inference: Optional[str] = None,
+                 accumulation_steps: int = 1,
+                 micro_batch_size: Optional[int] = None,
+                 loss_report_steps: int = 1,
+                 async_save: bool = False,
+                 max_pending_saves: int = 1,
+                 keep_last_checkpoints: Optional[int] = None,
+                 checkpoint_format: str = 'pth',
+                 shared_memory_name: Optional[str] = None,
+                 cpu_threads: Optional[Union[int, str]] = None,
+                 cpu_interop_threads: Optional[int] = None,
+                 cpu_affinity: Optional[List[int]] = None,
+                 distributed: Optional[str] = None,
+                 shard_optimizer: bool = False,
+                 optimizer_kwargs: Optional[Dict[str, Any]] = None,
+                 scheduler: Any = None,
+                 scheduler_kwargs: Optional[Dict[str, Any]] = None):
         """
         FCConfig is a configuration class to parameterize and create FC, TorchOptimization and TorchDataTransformation
         for the NetworkManager.
@@ -42,6 +62,29 @@ class FCConfig(TorchNetworkConfig):
         :param dim_layers: Size of each layer of the network.
         :param biases: Layers should have biases or not. This value can either be given as a bool for all layers or as
                        a list to detail each layer.
+        :param fused_inference: If True, predictions without gradients are computed with stacked parameters and
+                                reused workspaces instead of the sequence of layers.
+        :param mixed_precision: If specified, forward passes run under autocast with this reduced precision type
+                                (either 'float16' or 'bfloat16').
+        :param buffer_pool: If True, arrays are converted to tensors through persistent buffers.
+        :param compile_inference: If specified, forward passes in eval mode are compiled for each input shape, either
+                                  with a frozen TorchScript trace ('trace') or with torch.compile ('compile').
+        :param accumulation_steps: Number of batches over which gradients are accumulated before each optimizer step.
+        :param micro_batch_size: Maximal number of samples in a forward pass of a training batch.
+        :param loss_report_steps: Number of steps for which loss values are kept on the device before being reported.
+        :param async_save: If True, parameters are written from a background thread.
+        :param max_pending_saves: Maximum number of saves in progress with async_save.
+        :param keep_last_checkpoints: If set, only the last saved sets of parameters are kept.
+        :param checkpoint_format: File format of the saved parameters, either 'pth' or 'safetensors'.
+        :param shared_memory_name: If set, parameters loaded for prediction are shared between processes.
+        :param cpu_threads: Number of threads for CPU computations, None for the default policy or 'auto'.
+        :param cpu_interop_threads: Number of inter-op threads for CPU computations.
+        :param cpu_affinity: List of CPUs on which the process is pinned.
+        :param distributed: If specified, backend of the data-parallel training on several processes.
+        :param shard_optimizer: If True, the optimizer state is sharded between the data-parallel processes.
+        :param optimizer_kwargs: Additional arguments of the optimizer.
+        :param scheduler: Learning rate scheduler class.
+        :param scheduler_kwargs: Arguments of the learning rate scheduler.
         """
 
         TorchNetworkConfig.__init__(self,
@@ -57,7 +100,26 @@ class FCConfig(TorchNetworkConfig):
                                     require_training_stuff=require_training_stuff,
                                     lr=lr,
                                     loss=loss,
-                                    optimizer=optimizer)
+                                    optimizer=optimizer,
+                                    mixed_precision=mixed_precision,
+                                    buffer_pool=buffer_pool,
+                                    compile_inference=compile_inference,
+                                    accumulation_steps=accumulation_steps,
+                                    micro_batch_size=micro_batch_size,
+                                    loss_report_steps=loss_report_steps,
+                                    async_save=async_save,
+                                    max_pending_saves=max_pending_saves,
+                                    keep_last_checkpoints=keep_last_checkpoints,
+                                    checkpoint_format=checkpoint_format,
+                                    shared_memory_name=shared_memory_name,
+                                    cpu_threads=cpu_threads,
+                                    cpu_interop_threads=cpu_interop_threads,
+                                    cpu_affinity=cpu_affinity,
+                                    distributed=distributed,
+                                    shard_optimizer=shard_optimizer,
+                                    optimizer_kwargs=optimizer_kwargs,
+                                    scheduler=scheduler,
+                                    scheduler_kwargs=scheduler_kwargs)
 
         # Check FC variables
         if dim_output is not None and type(dim_output) != int:
@@ -67,10 +129,14 @@ class FCConfig(TorchNetworkConfig):
         if type(dim_layers) != list:
             raise TypeError(f"[{self.__class__.__name__}] Wrong 'dim_layers' type: list required, get "
                             f"{type(dim_layers)}")
+        if type(fused_inference) != bool:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'fused_inference' type: bool required, get "
+                            f"{type(fused_inference)}")
 
         self.network_config = make_config(configuration_object=self,
                                           configuration_name='network_config',
                                           network_type='FC',
                                           dim_output=dim_output,
                                           dim_layers=dim_layers,
-                                          biases=biases)
+                                          biases=biases,
+                                          fused_inference=fused_inference)
@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Tuple
+from torch import Tensor, stack, baddbmm, bmm, is_grad_enabled
+from torch.nn import Sequential, ModuleList
+from collections import namedtuple
+
+from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
+from DeepPhysX.Torch.FC.FC import FC
+
+
+class FCEnsemble(TorchNetwork):
+
+    def __init__(self,
+                 config: namedtuple):
+        """
+        Create an ensemble of Fully Connected layers Neural Networks sharing the same architecture. The members are
+        evaluated together with batched matrix products and the prediction is the mean of the members predictions,
+        given with their variance.
+
+        :param config: Set of FCEnsemble parameters.
+        """
+
+        TorchNetwork.__init__(self, config)
+
+        # Data fields, the variance is given in the normalized space of the prediction
+        self.net_fields = ['input']
+        self.opt_fields = ['ground_truth']
+        self.pred_fields = ['prediction', 'variance']
+        self.pred_norm_fields['variance'] = 'variance'
+
+        # Predictions of the members are stacked in the first dimension, samples are in the second one
+        self.pred_batch_dim = 1
+
+        # Init the members, each member has the layers of a FC
+        self.members = ModuleList([Sequential(*FC.create_layers(self.config.dim_layers, self.config.biases))
+                                   for _ in range(self.config.nb_members)])
+
+    def predict(self,
+                data_net: Dict[str, Tensor]) -> Dict[str, Tensor]:
+        """
+        Compute a forward pass of the members and reduce their predictions.
+
+        :param data_net: Data used by the Network.
+        :return: Mean and variance of the members predictions.
+        """
+
+        # Reductions over the small members dimension are faster as element-wise operations than with var_mean
+        predictions = TorchNetwork.predict(self, data_net)['prediction']
+        mean = predictions.mean(dim=0)
+        deviations = predictions - mean
+        return {'prediction': mean, 'variance': (deviations * deviations).mean(dim=0)}
+
+    def forward(self,
+                input_data: Tensor) -> Tensor:
+        """
+        Compute a forward pass of all the members.
+
+        :param input_data: Input tensor.
+        :return: Predictions of the members, stacked in the first dimension.
+        """
+
+        nb_samples = input_data.shape[0]
+        res = input_data.view(nb_samples, -1).expand(self.config.nb_members, nb_samples, -1)
+        for weight, bias, slope in self.get_stacked_layers():
+            res = bmm(res, weight) if bias is None else baddbmm(bias, res, weight)
+            if slope is not None:
+                res = res + slope * res.clamp(max=0)
+        return res.view(self.config.nb_members, nb_samples, -1, self.config.dim_output)
+
+    def get_stacked_layers(self) -> List[Tuple[Tensor, Optional[Tensor], Optional[Tensor]]]:
+        """
+        Stack the parameters of the members for each layer. Without gradients, the stacked parameters are kept until
+        the parameters of the members are modified.
+
+        :return: Transposed weights, biases and activation slopes minus one of each layer.
+        """
+
+        if is_grad_enabled():
+            return self.stack_layers()
+        return self.get_stacked_parameters(lambda: [tuple(None if tensor is None else tensor.contiguous()
+                                                          for tensor in layer) for layer in self.stack_layers()])
+
+    def stack_layers(self) -> List[Tuple[Tensor, Optional[Tensor], Optional[Tensor]]]:
+        """
+        Stack the parameters of the members for each layer. A PReLU with slope a is computed as x + (a - 1) * min(x, 0).
+
+        :return: Transposed weights, biases and activation slopes minus one of each layer.
+        """
+
+        layers = []
+        for i in range(0, len(self.members[0]), 2):
+            linears = [member[i] for member in self.members]
+            weight = stack([linear.weight for linear in linears]).transpose(1, 2)
+            bias = None if linears[0].bias is None else stack([linear.bias for linear in linears]).unsqueeze(1)
+            slope = None
+            if i + 1 < len(self.members[0]):
+                slope = stack([member[i + 1].weight for member in self.members]).unsqueeze(1) - 1
+            layers.append((weight, bias, slope))
+        return layers
+
+    def load_members(self,
+                     paths: List[str]) -> None:
+        """
+        Load the parameters of independently trained FC networks in the members of the ensemble.
+
+        :param paths: Path to the parameters of each FC network.
+        """
+
+        if len(paths) != self.config.nb_members:
+            raise ValueError(f"[{self.__class__.__name__}] {self.config.nb_members} FC parameters files required, get "
+                             f"{len(paths)}.")
+        self.wait_saves()
+        for member, path in zip(self.members, paths):
+            parameters = self.read_parameters(path)
+            member.load_state_dict({key[len('linear.'):]: value for key, value in parameters.items()
+                                    if key.startswith('linear.')})
+        self.compiled_forwards.clear()
+        self.reset_stacked_parameters()
+
+    def quantize(self,
+                 samples: Optional[List[Tensor]] = None) -> Dict[str, float]:
+        """
+        The members are evaluated with stacked parameters, which can not be quantized.
+
+        :param samples: Input tensors used to measure the drift of the quantized predictions.
+        """
+
+        raise ValueError(f"[{self.__class__.__name__}] An ensemble of FC networks can not be quantized.")
+
+    def __str__(self):
+
+        description = TorchNetwork.__str__(self)
+        description += self.members[0].__str__() + "\n"
+        description += f"    Number of members: {self.config.nb_members}\n"
+        description += f"    Layers dimensions: {self.config.dim_layers}\n"
+        description += f"    Output dimension: {self.config.dim_output}\n"
+        return description
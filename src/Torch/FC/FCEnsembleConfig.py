@@ -0,0 +1,143 @@
+from typing import Any, Optional, Type, Union, List, Dict
+
+from DeepPhysX.Core.Utils.configs import make_config
+from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig, TorchTransformation, TorchOptimization
+from DeepPhysX.Torch.FC.FCEnsemble import FCEnsemble
+
+
+class FCEnsembleConfig(TorchNetworkConfig):
+
+    def __init__(self,
+                 optimization_class: Type[TorchOptimization] = TorchOptimization,
+                 data_transformation_class: Type[TorchTransformation] = TorchTransformation,
+                 network_dir: Optional[str] = None,
+                 network_name: str = "FCEnsembleNetwork",
+                 which_network: int = 0,
+                 save_each_epoch: bool = False,
+                 data_type: str = 'float32',
+                 lr: Optional[float] = None,
+                 require_training_stuff: bool = True,
+                 loss: Any = None,
+                 optimizer: Any = None,
+                 dim_output: int = 0,
+                 dim_layers: list = None,
+                 biases: Union[List[bool], bool] = True,
+                 nb_members: int = 2,
+                 mixed_precision: Optional[str] = None,
+                 buffer_pool: bool = False,
+                 compile_inference: Optional[str] = None,
+                 accumulation_steps: int = 1,
+                 micro_batch_size: Optional[int] = None,
+                 loss_report_steps: int = 1,
+                 async_save: bool = False,
+                 max_pending_saves: int = 1,
+                 keep_last_checkpoints: Optional[int] = None,
+                 checkpoint_format: str = 'pth',
+                 shared_memory_name: Optional[str] = None,
+                 cpu_threads: Optional[Union[int, str]] = None,
+                 cpu_interop_threads: Optional[int] = None,
+                 cpu_affinity: Optional[List[int]] = None,
+                 distributed: Optional[str] = None,
+                 shard_optimizer: bool = False,
+                 optimizer_kwargs: Optional[Dict[str, Any]] = None,
+                 scheduler: Any = None,
+                 scheduler_kwargs: Optional[Dict[str, Any]] = None):
+        """
+        FCEnsembleConfig is a configuration class to parameterize and create FCEnsemble, TorchOptimization and
+        TorchDataTransformation for the NetworkManager.
+
+        :param optimization_class: TorchOptimization class from which an instance will be created.
+        :param data_transformation_class: DataTransformation class from which an instance will be created.
+        :param network_dir: Path to an existing network repository.
+        :param network_name: Name of the network
+        :param  which_network: If several networks in network_dir, load the specified one.
+        :param save_each_epoch: If True, network state will be saved at each epoch end; if False, network state
+                                will be saved at the end of the training
+        :param data_type: Type of the training data.
+        :param lr: Learning rate.
+        :param require_training_stuff: If specified, loss and optimizer class can be not necessary for training.
+        :param loss: Loss class.
+        :param optimizer: Network's parameters optimizer class.
+        :param dim_output: Dimension of the output.
+        :param dim_layers: Size of each layer of the members.
+        :param biases: Layers should have biases or not. This value can either be given as a bool for all layers or as
+                       a list to detail each layer.
+        :param nb_members: Number of FC networks in the ensemble.
+        :param mixed_precision: If specified, forward passes run under autocast with this reduced precision type
+                                (either 'float16' or 'bfloat16').
+        :param buffer_pool: If True, arrays are converted to tensors through persistent buffers.
+        :param compile_inference: If specified, forward passes in eval mode are compiled for each input shape, either
+                                  with a frozen TorchScript trace ('trace') or with torch.compile ('compile').
+        :param accumulation_steps: Number of batches over which gradients are accumulated before each optimizer step.
+        :param micro_batch_size: Maximal number of samples in a forward pass of a training batch.
+        :param loss_report_steps: Number of steps for which loss values are kept on the device before being reported.
+        :param async_save: If True, parameters are written from a background thread.
+        :param max_pending_saves: Maximum number of saves in progress with async_save.
+        :param keep_last_checkpoints: If set, only the last saved sets of parameters are kept.
+        :param checkpoint_format: File format of the saved parameters, either 'pth' or 'safetensors'.
+        :param shared_memory_name: If set, parameters loaded for prediction are shared between processes.
+        :param cpu_threads: Number of threads for CPU computations, None for the default policy or 'auto'.
+        :param cpu_interop_threads: Number of inter-op threads for CPU computations.
+        :param cpu_affinity: List of CPUs on which the process is pinned.
+        :param distributed: If specified, backend of the data-parallel training on several processes.
+        :param shard_optimizer: If True, the optimizer state is sharded between the data-parallel processes.
+        :param optimizer_kwargs: Additional arguments of the optimizer.
+        :param scheduler: Learning rate scheduler class.
+        :param scheduler_kwargs: Arguments of the learning rate scheduler.
+        """
+
+        TorchNetworkConfig.__init__(self,
+                                    network_class=FCEnsemble,
+                                    optimization_class=optimization_class,
+                                    data_transformation_class=data_transformation_class,
+                                    network_dir=network_dir,
+                                    network_name=network_name,
+                                    network_type='FCEnsemble',
+                                    which_network=which_network,
+                                    save_each_epoch=save_each_epoch,
+                                    data_type=data_type,
+                                    require_training_stuff=require_training_stuff,
+                                    lr=lr,
+                                    loss=loss,
+                                    optimizer=optimizer,
+                                    mixed_precision=mixed_precision,
+                                    buffer_pool=buffer_pool,
+                                    compile_inference=compile_inference,
+                                    accumulation_steps=accumulation_steps,
+                                    micro_batch_size=micro_batch_size,
+                                    loss_report_steps=loss_report_steps,
+                                    async_save=async_save,
+                                    max_pending_saves=max_pending_saves,
+                                    keep_last_checkpoints=keep_last_checkpoints,
+                                    checkpoint_format=checkpoint_format,
+                                    shared_memory_name=shared_memory_name,
+                                    cpu_threads=cpu_threads,
+                                    cpu_interop_threads=cpu_interop_threads,
+                                    cpu_affinity=cpu_affinity,
+                                    distributed=distributed,
+                                    shard_optimizer=shard_optimizer,
+                                    optimizer_kwargs=optimizer_kwargs,
+                                    scheduler=scheduler,
+                                    scheduler_kwargs=scheduler_kwargs)
+
+        # Check FCEnsemble variables
+        if dim_output is not None and type(dim_output) != int:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'dim_output' type: int required, get "
+                            f"{type(dim_output)}")
+        dim_layers = dim_layers if dim_layers else []
+        if type(dim_layers) != list:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'dim_layers' type: list required, get "
+                            f"{type(dim_layers)}")
+        if type(nb_members) != int:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'nb_members' type: int required, get "
+                            f"{type(nb_members)}")
+        if nb_members < 1:
+            raise ValueError(f"[{self.__class__.__name__}] 'nb_members' must be positive")
+
+        self.network_config = make_config(configuration_object=self,
+                                          configuration_name='network_config',
+                                          network_type='FCEnsemble',
+                                          dim_output=dim_output,
+                                          dim_layers=dim_layers,
+                                          biases=biases,
+                                          nb_members=nb_members)
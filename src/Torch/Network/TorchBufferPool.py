@@ -0,0 +1,119 @@
+from typing import Dict, List, Tuple, Any
+from weakref import ref
+from numpy import ndarray, zeros, copyto
+from torch import Tensor, device, empty, from_numpy, no_grad
+from torch.cuda import Event
+
+
+class TorchBufferPool:
+
+    def __init__(self,
+                 target_device: device,
+                 nb_slots: int = 2):
+        """
+        TorchBufferPool keeps persistent host and device buffers to transfer arrays on the Network device without
+        allocating new tensors at each step. Host buffers are page-locked when the device is a GPU. On CPU, arrays are
+        converted without copy instead, so the pool is only used with a GPU.
+
+        :param target_device: Device on which tensors are computed.
+        :param nb_slots: Initial number of buffers for each (shape, data type) key. A buffer is only reused once the
+                         tensor returned for it is released, new buffers are allocated while all of them are in use
+                         (e.g. input and ground truth of the same shape converted during a single step).
+        """
+
+        self.device: device = target_device
+        self.nb_slots: int = nb_slots
+        self.pin_memory: bool = target_device.type == 'cuda'
+
+        # Buffers are stored as [host tensor, host array, device tensor, copy event, returned tensor] for each slot
+        self.buffers: Dict[Tuple[Tuple[int, ...], str], List[List[Any]]] = {}
+
+    def allocate(self,
+                 shape: Tuple[int, ...],
+                 data_type: str) -> None:
+        """
+        Allocate the buffers for a given shape and data type. Can be used to pre-allocate the expected batch shapes.
+
+        :param shape: Shape of the arrays to convert.
+        :param data_type: Data type of the tensors.
+        """
+
+        key = (tuple(shape), data_type)
+        if key in self.buffers:
+            return
+        self.buffers[key] = []
+        for _ in range(self.nb_slots):
+            self.allocate_slot(key)
+
+    def allocate_slot(self,
+                      key: Tuple[Tuple[int, ...], str]) -> List[Any]:
+        """
+        Allocate a new buffer for a given (shape, data type) key.
+
+        :param key: Shape and data type of the buffer.
+        :return: Host tensor, host array, device tensor, copy event and returned tensor of the buffer.
+        """
+
+        tensor_type = from_numpy(zeros(0, dtype=key[1])).dtype
+        host = empty(key[0], dtype=tensor_type, pin_memory=self.pin_memory)
+        if self.device.type == 'cpu':
+            slot = [host, host.numpy(), host, None, None]
+        else:
+            slot = [host, host.numpy(), empty(key[0], dtype=tensor_type, device=self.device),
+                    Event() if self.pin_memory else None, None]
+        self.buffers[key].append(slot)
+        return slot
+
+    def transfer(self,
+                 data: ndarray,
+                 data_type: str) -> Tensor:
+        """
+        Copy an array in an available buffer and return the corresponding device tensor.
+        The returned tensor shares its storage with the buffer, which is reused by a later transfer once the tensor is
+        released.
+
+        :param data: Array data to convert.
+        :param data_type: Data type of the tensor.
+        :return: Tensor on the target device.
+        """
+
+        key = (data.shape, data_type)
+        if key not in self.buffers:
+            self.allocate(data.shape, data_type)
+
+        # Buffers viewed by living tensors must not be overwritten
+        slot = next((slot for slot in self.buffers[key] if slot[4] is None or slot[4]() is None), None)
+        if slot is None:
+            slot = self.allocate_slot(key)
+        host, host_array, device_buffer, event, _ = slot
+
+        # Wait for the previous copy from this host buffer to complete before overwriting it
+        if event is not None:
+            event.synchronize()
+        copyto(host_array, data, casting='unsafe')
+        if device_buffer is not host:
+            with no_grad():
+                device_buffer.copy_(host, non_blocking=True)
+            if event is not None:
+                event.record()
+
+        # Detached view: a new leaf for autograd without any new storage
+        tensor = device_buffer.detach()
+        slot[4] = ref(tensor)
+        return tensor
+
+    def clear(self) -> None:
+        """
+        Release all the buffers.
+        """
+
+        self.buffers.clear()
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"  {self.__class__.__name__}\n"
+        description += f"    Device: {self.device}\n"
+        description += f"    Pinned memory: {self.pin_memory}\n"
+        description += f"    Buffered shapes: {[key[0] for key in self.buffers]}\n"
+        return description
@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional
+from os import replace, remove, close, open as os_open, O_WRONLY, O_CREAT, O_EXCL
+from os.path import dirname, exists, join
+from secrets import token_hex
+from threading import Thread, Semaphore, Lock
+from collections import OrderedDict
+from torch import Tensor, save
+
+
+class TorchCheckpointWriter:
+
+    def __init__(self,
+                 asynchronous: bool = True,
+                 max_pending_saves: int = 1,
+                 keep_last: Optional[int] = None,
+                 file_format: str = 'pth'):
+        """
+        TorchCheckpointWriter saves sets of parameters either on the calling thread or from background threads.
+        Parameters are copied to host memory before being written in background, then the file is written in a
+        temporary file and renamed so that a checkpoint file is never partially written.
+
+        :param asynchronous: If True, files are written from background threads.
+        :param max_pending_saves: Maximum number of saves in progress, a new save waits for a previous one to end.
+        :param keep_last: If set, only the last written checkpoints are kept.
+        :param file_format: Format of the checkpoint files, either 'pth' or 'safetensors'.
+        """
+
+        self.asynchronous: bool = asynchronous
+        self.max_pending_saves: int = max_pending_saves
+        self.keep_last: Optional[int] = keep_last
+        self.file_format: str = file_format
+
+        # Threads are not daemonic so that pending saves complete before the interpreter exits
+        self.pending_saves: Semaphore = Semaphore(max_pending_saves)
+        self.threads: List[Thread] = []
+        self.lock: Lock = Lock()
+        self.saved_paths: List[str] = []
+        self.errors: List[Exception] = []
+
+    def save(self,
+             state_dict: Dict[str, Tensor],
+             path: str) -> None:
+        """
+        Save a set of parameters to the path location.
+
+        :param state_dict: Set of parameters to save.
+        :param path: Path of the checkpoint file.
+        """
+
+        self.check_errors()
+
+        # Parameters are not modified while writing on the calling thread
+        if not self.asynchronous:
+            parameters = self.copy_metadata(state_dict, OrderedDict(
+                (key, value.detach().contiguous() if isinstance(value, Tensor) else value)
+                for key, value in state_dict.items()))
+            self.pending_saves.acquire()
+            self.write(parameters, path)
+            self.check_errors()
+            return
+
+        # Snapshot the parameters in host memory so that training can go on while writing
+        self.pending_saves.acquire()
+        try:
+            snapshot = self.copy_metadata(state_dict, OrderedDict(
+                (key, value.detach().to('cpu', copy=True).contiguous() if isinstance(value, Tensor) else value)
+                for key, value in state_dict.items()))
+        except BaseException:
+            self.pending_saves.release()
+            raise
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        thread = Thread(target=self.write, args=(snapshot, path), name=f'{self.__class__.__name__}', daemon=False)
+        self.threads.append(thread)
+        thread.start()
+
+    @staticmethod
+    def copy_metadata(state_dict: Dict[str, Tensor],
+                      parameters: OrderedDict) -> OrderedDict:
+        """
+        Keep the metadata of a state dict (versions of the modules used when loading parameters) in its copy.
+
+        :param state_dict: Set of parameters of the Network.
+        :param parameters: Copy of the set of parameters.
+        :return: Copy of the set of parameters with the metadata.
+        """
+
+        metadata = getattr(state_dict, '_metadata', None)
+        if metadata is not None:
+            parameters._metadata = metadata
+        return parameters
+
+    def write(self,
+              snapshot: Dict[str, Tensor],
+              path: str) -> None:
+        """
+        Write a snapshot in a temporary file then move it to the path location.
+
+        :param snapshot: Set of parameters to write.
+        :param path: Path of the checkpoint file.
+        """
+
+        tmp_path = None
+        try:
+            # Temporary file name must not be listed as a network file by the NetworkManager, the file is created with
+            # the default permissions (unlike mkstemp) since it becomes the checkpoint file
+            tmp_path = join(dirname(path) or '.', f'.checkpoint_{token_hex(8)}.tmp')
+            close(os_open(tmp_path, O_WRONLY | O_CREAT | O_EXCL, 0o666))
+            if self.file_format == 'safetensors':
+                from safetensors.torch import save_file
+                save_file(snapshot, tmp_path)
+            else:
+                save(snapshot, tmp_path)
+            replace(tmp_path, path)
+            tmp_path = None
+            self.rotate(path)
+        except Exception as error:
+            with self.lock:
+                self.errors.append(error)
+        finally:
+            if tmp_path is not None and exists(tmp_path):
+                remove(tmp_path)
+            self.pending_saves.release()
+
+    def rotate(self,
+               path: str) -> None:
+        """
+        Register a written checkpoint and remove the oldest ones if needed.
+
+        :param path: Path of the written checkpoint file.
+        """
+
+        with self.lock:
+            if path in self.saved_paths:
+                self.saved_paths.remove(path)
+            self.saved_paths.append(path)
+            if self.keep_last is None:
+                return
+            while len(self.saved_paths) > self.keep_last:
+                old_path = self.saved_paths.pop(0)
+                if exists(old_path):
+                    remove(old_path)
+
+    def wait(self) -> None:
+        """
+        Wait for all the pending saves to complete.
+        """
+
+        for thread in self.threads:
+            thread.join()
+        self.threads.clear()
+        self.check_errors()
+
+    def check_errors(self) -> None:
+        """
+        Raise the first error that occurred in a background save.
+        """
+
+        with self.lock:
+            errors, self.errors = self.errors, []
+        if len(errors) > 0:
+            raise RuntimeError(f"[{self.__class__.__name__}] Checkpoint saving failed: {errors[0]}") from errors[0]
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"  {self.__class__.__name__}\n"
+        description += f"    Asynchronous: {self.asynchronous}\n"
+        description += f"    Max pending saves: {self.max_pending_saves}\n"
+        description += f"    Keep last checkpoints: {self.keep_last}\n"
+        description += f"    File format: {self.file_format}\n"
+        return description
@@ -0,0 +1,145 @@
+from typing import Any, Callable, List, Optional, Union
+import os
+from os.path import exists
+from math import ceil
+from time import perf_counter
+from torch import set_num_threads, set_num_interop_threads, get_num_threads
+
+
+class TorchCpuPolicy:
+
+    def __init__(self,
+                 nb_threads: Optional[Union[int, str]] = None,
+                 nb_interop_threads: Optional[int] = None,
+                 affinity: Optional[List[int]] = None):
+        """
+        TorchCpuPolicy defines the number of threads used for CPU computations, within the CPUs available for the
+        process (affinity and container quota).
+
+        :param nb_threads: Number of intra-op threads. If None, all the available CPUs but one are used. If 'auto', the
+                           number of threads is tuned on the first prediction.
+        :param nb_interop_threads: Number of inter-op threads. If None, PyTorch default is used.
+        :param affinity: List of CPUs on which the process is pinned. If None, the affinity is unchanged.
+        """
+
+        self.nb_threads: Optional[Union[int, str]] = nb_threads
+        self.nb_interop_threads: Optional[int] = nb_interop_threads
+        self.affinity: Optional[List[int]] = affinity
+        self.auto: bool = nb_threads == 'auto'
+        self.tuned: bool = False
+        self.timings: dict = {}
+
+    @staticmethod
+    def cgroup_cpu_limit() -> Optional[float]:
+        """
+        Read the CPU quota of the container (cgroup v2, then cgroup v1).
+
+        :return: Number of CPUs allowed by the quota, None if there is no quota.
+        """
+
+        try:
+            if exists('/sys/fs/cgroup/cpu.max'):
+                with open('/sys/fs/cgroup/cpu.max') as file:
+                    quota, period = file.read().split()[:2]
+                return None if quota == 'max' else int(quota) / int(period)
+            if exists('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'):
+                with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as file:
+                    quota = int(file.read())
+                with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as file:
+                    period = int(file.read())
+                return None if quota <= 0 else quota / period
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @classmethod
+    def available_cpus(cls) -> int:
+        """
+        Get the number of CPUs the process can use, given its affinity and the container quota.
+
+        :return: Number of available CPUs.
+        """
+
+        try:
+            # Affinity is only available on some platforms (not on macOS and Windows)
+            nb_cpus = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            nb_cpus = os.cpu_count() or 1
+        quota = cls.cgroup_cpu_limit()
+        if quota is not None:
+            nb_cpus = min(nb_cpus, max(1, ceil(quota)))
+        return nb_cpus
+
+    def apply(self) -> None:
+        """
+        Pin the process on the required CPUs and set the numbers of threads.
+        """
+
+        if self.affinity is not None:
+            try:
+                os.sched_setaffinity(0, self.affinity)
+            except (AttributeError, OSError):
+                print(f"[{self.__class__.__name__}] CPU affinity is not supported on this platform, keeping the "
+                      f"current affinity.")
+        nb_cpus = self.available_cpus()
+        if self.nb_threads is None or self.auto:
+            set_num_threads(max(1, nb_cpus - 1))
+        else:
+            set_num_threads(self.nb_threads)
+        if self.nb_interop_threads is not None:
+            try:
+                set_num_interop_threads(self.nb_interop_threads)
+            except RuntimeError:
+                # Inter-op threads can only be set once, before any inter-op parallel work
+                print(f"[{self.__class__.__name__}] Number of inter-op threads can not be changed after parallel work "
+                      f"has started, keeping the current value.")
+
+    def tuning_required(self,
+                        training: bool) -> bool:
+        """
+        Check if the number of threads must be tuned before a prediction.
+
+        :param training: Whether the Network is in train mode.
+        :return: True if the number of threads is not tuned yet in auto mode.
+        """
+
+        return self.auto and not self.tuned and not training
+
+    def tune(self,
+             function: Callable[[], Any],
+             nb_runs: int = 5) -> int:
+        """
+        Measure the duration of a function for several numbers of threads and keep the fastest one.
+
+        :param function: Function to benchmark, typically a forward pass on a representative input.
+        :param nb_runs: Number of measured runs for each number of threads.
+        :return: Selected number of threads.
+        """
+
+        nb_cpus = self.available_cpus()
+        candidates = sorted({min(2 ** i, nb_cpus) for i in range(nb_cpus.bit_length() + 1)} | {max(1, nb_cpus - 1)})
+        self.timings = {}
+        for nb_threads in candidates:
+            set_num_threads(nb_threads)
+            function()
+            timings = []
+            for _ in range(nb_runs):
+                start = perf_counter()
+                function()
+                timings.append(perf_counter() - start)
+            self.timings[nb_threads] = sorted(timings)[len(timings) // 2]
+        self.nb_threads = min(self.timings, key=self.timings.get)
+        set_num_threads(self.nb_threads)
+        self.tuned = True
+        print(f"[{self.__class__.__name__}] Tuned number of threads: {self.nb_threads}")
+        return self.nb_threads
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"  {self.__class__.__name__}\n"
+        description += f"    Available CPUs: {self.available_cpus()}\n"
+        description += f"    Number of threads: {get_num_threads()}{' (auto)' if self.auto else ''}\n"
+        description += f"    Number of inter-op threads: {self.nb_interop_threads}\n"
+        description += f"    Affinity: {self.affinity}\n"
+        return description
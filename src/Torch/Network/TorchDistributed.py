@@ -0,0 +1,156 @@
+from typing import Iterable, Optional
+from os import environ
+from numpy import ndarray
+from torch import Tensor, cat, zeros_like
+from torch.nn import Module
+import torch.distributed as dist
+
+
+class TorchDistributed:
+
+    def __init__(self,
+                 backend: str = 'gloo'):
+        """
+        TorchDistributed synchronizes the data-parallel training of a Network between several processes. Each process
+        trains on a shard of the batches, gradients are averaged before each optimizer step and only the main process
+        saves the parameters, once the buffers are averaged. Processes are launched with torchrun (on one or several
+        hosts), which defines the rank and the world size in the environment; a single process group is created
+        without it.
+
+        :param backend: Backend of the process group.
+        """
+
+        self.backend: str = backend
+        self.rank: int = int(environ.get('RANK', 0))
+        self.world_size: int = int(environ.get('WORLD_SIZE', 1))
+        self.local_rank: int = int(environ.get('LOCAL_RANK', 0))
+        self.local_world_size: int = int(environ.get('LOCAL_WORLD_SIZE', 1))
+
+        # Flat buffer of the gradients, reused for each all-reduce
+        self.gradients: Optional[Tensor] = None
+
+        # Weight of the loss of the last shard, shards of uneven sizes contribute to the gradients as in the whole batch
+        self.shard_weight: float = 1.
+
+    @property
+    def is_main(self) -> bool:
+        """
+        Check if the process is the main process (rank 0).
+        """
+
+        return self.rank == 0
+
+    def setup(self) -> None:
+        """
+        Create the process group if it does not exist yet.
+        """
+
+        if not dist.is_initialized():
+            if 'MASTER_ADDR' in environ:
+                dist.init_process_group(backend=self.backend, init_method='env://')
+            else:
+                dist.init_process_group(backend=self.backend, store=dist.HashStore(), rank=0, world_size=1)
+        self.rank = dist.get_rank()
+        self.world_size = dist.get_world_size()
+
+    def cleanup(self) -> None:
+        """
+        Destroy the process group.
+        """
+
+        if dist.is_initialized():
+            dist.destroy_process_group()
+
+    def shard(self,
+              data: ndarray) -> ndarray:
+        """
+        Get the part of a batch processed by the current process. Batches smaller than the number of processes are not
+        split. The shard weight is set to the shard size relative to an even split of the batch.
+
+        :param data: Batch of samples.
+        :return: Contiguous shard of the batch.
+        """
+
+        if self.world_size == 1 or len(data) < self.world_size:
+            self.shard_weight = 1.
+            return data
+        shard = data[self.rank * len(data) // self.world_size:(self.rank + 1) * len(data) // self.world_size]
+        self.shard_weight = len(shard) * self.world_size / len(data)
+        return shard
+
+    def broadcast_parameters(self,
+                             module: Module) -> None:
+        """
+        Copy the parameters and the buffers of the main process in the other processes.
+
+        :param module: Module to synchronize.
+        """
+
+        if self.world_size > 1:
+            for tensor in list(module.parameters()) + list(module.buffers()):
+                dist.broadcast(tensor.data, src=0)
+
+    def average_buffers(self,
+                        module: Module) -> None:
+        """
+        Average the floating point buffers between processes (e.g. normalization running statistics), other buffers
+        are copied from the main process.
+
+        :param module: Module to synchronize.
+        """
+
+        if self.world_size > 1:
+            for buffer in module.buffers():
+                if buffer.is_floating_point():
+                    dist.all_reduce(buffer.data)
+                    buffer.data /= self.world_size
+                else:
+                    dist.broadcast(buffer.data, src=0)
+
+    def all_reduce_gradients(self,
+                             parameters: Iterable[Tensor]) -> None:
+        """
+        Average the gradients between processes with a single all-reduce on a flat buffer. Losses are weighted by the
+        shard weight before the backward pass, so the average gives the gradients of the whole batch.
+
+        :param parameters: Parameters whose gradients are averaged.
+        """
+
+        if self.world_size == 1:
+            return
+        parameters = [parameter for parameter in parameters if parameter.requires_grad]
+        for parameter in parameters:
+            if parameter.grad is None:
+                parameter.grad = zeros_like(parameter)
+        gradients = [parameter.grad for parameter in parameters]
+        if self.gradients is None or self.gradients.numel() != sum(gradient.numel() for gradient in gradients) or \
+                self.gradients.dtype != gradients[0].dtype or self.gradients.device != gradients[0].device:
+            self.gradients = cat([gradient.reshape(-1) for gradient in gradients])
+        else:
+            offset = 0
+            for gradient in gradients:
+                self.gradients[offset:offset + gradient.numel()].copy_(gradient.reshape(-1))
+                offset += gradient.numel()
+        dist.all_reduce(self.gradients)
+        self.gradients /= self.world_size
+        offset = 0
+        for gradient in gradients:
+            gradient.copy_(self.gradients[offset:offset + gradient.numel()].view_as(gradient))
+            offset += gradient.numel()
+
+    def barrier(self) -> None:
+        """
+        Wait for all the processes.
+        """
+
+        if self.world_size > 1:
+            dist.barrier()
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"  {self.__class__.__name__}\n"
+        description += f"    Backend: {self.backend}\n"
+        description += f"    Rank: {self.rank}\n"
+        description += f"    World size: {self.world_size}\n"
+        return description
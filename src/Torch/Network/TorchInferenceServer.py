@@ -0,0 +1,332 @@
+from typing import Dict, List, Optional, Tuple, Any
+from multiprocessing.connection import Listener, Client, Connection
+from multiprocessing import AuthenticationError
+from secrets import token_bytes
+from threading import Thread, Event, Lock
+from queue import Queue, Empty
+from collections import deque
+from time import perf_counter
+from numpy import ndarray, array, percentile
+
+from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
+from DeepPhysX.Torch.Network.TorchTransformation import TorchTransformation
+
+
+class TorchInferenceServer:
+
+    def __init__(self,
+                 network: TorchNetwork,
+                 data_transformation: TorchTransformation,
+                 address: Tuple[str, int] = ('localhost', 10010),
+                 authkey: Optional[bytes] = None,
+                 max_batch_size: int = 32,
+                 batch_timeout: float = 1e-3,
+                 normalization: Optional[Dict[str, List[float]]] = None):
+        """
+        TorchInferenceServer collects prediction requests from several clients, gathers them in batches and computes
+        a single prediction for each batch with the Network and the TorchTransformation pipeline.
+
+        :param network: Network used for predictions, its parameters must be already loaded.
+        :param data_transformation: Transformation applied on data before and after predictions.
+        :param address: Address of the local socket (host, port) or a Unix socket path.
+        :param authkey: Authentication key shared with the clients. If None, a random key is generated, clients get it
+                        from the authkey attribute of the server.
+        :param max_batch_size: Maximum number of samples in a batch.
+        :param batch_timeout: Maximum time in seconds to wait for other requests once a first request is received.
+        :param normalization: Normalization coefficients of the data fields.
+        """
+
+        self.name: str = self.__class__.__name__
+
+        # Prediction pipeline
+        self.network: TorchNetwork = network
+        self.data_transformation: TorchTransformation = data_transformation
+        self.normalization: Dict[str, List[float]] = {} if normalization is None else normalization
+        self.network.set_eval()
+
+        # Batching parameters
+        self.max_batch_size: int = max_batch_size
+        self.batch_timeout: float = batch_timeout
+
+        # Connections
+        self.address: Any = address
+        # Requests are unpickled, so connections are always authenticated
+        self.authkey: bytes = token_bytes(32) if authkey is None else authkey
+        self.listener: Optional[Listener] = None
+        self.connections: List[Connection] = []
+        self.connections_lock: Lock = Lock()
+        self.requests: Queue = Queue()
+        self.threads: List[Thread] = []
+        self.running: Event = Event()
+
+        # Statistics
+        self.latencies: deque = deque(maxlen=100000)
+        self.batch_sizes: deque = deque(maxlen=100000)
+        self.start_time: float = 0.
+
+    def start(self) -> None:
+        """
+        Start accepting clients and computing batched predictions in background threads.
+        """
+
+        self.listener = Listener(address=self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.running.set()
+        self.reset_statistics()
+        for target in [self.accept_clients, self.serve]:
+            thread = Thread(target=target, daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the server and close the connections.
+        """
+
+        if not self.running.is_set():
+            return
+        self.running.clear()
+
+        # Wake the accepting thread up with a last connection
+        try:
+            Client(address=self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        for thread in self.threads:
+            thread.join()
+        self.threads.clear()
+        with self.connections_lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections.clear()
+        self.listener.close()
+
+    def accept_clients(self) -> None:
+        """
+        Accept the new clients and listen to their requests.
+        """
+
+        while self.running.is_set():
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue
+            if not self.running.is_set():
+                connection.close()
+                break
+            with self.connections_lock:
+                self.connections.append(connection)
+            thread = Thread(target=self.receive_requests, args=(connection,), daemon=True)
+            thread.start()
+
+    def receive_requests(self,
+                         connection: Connection) -> None:
+        """
+        Receive the requests of a client and add them to the requests queue. Malformed requests are answered with an
+        error on this connection only, so that they never reach the batches of the other clients.
+
+        :param connection: Connection with the client.
+        """
+
+        while self.running.is_set():
+            try:
+                request = connection.recv()
+            except (OSError, EOFError):
+                break
+            if not isinstance(request, tuple) or len(request) != 2:
+                continue
+            request_id, sample = request
+            error = self.check_sample(sample)
+            if error is not None:
+                try:
+                    connection.send((request_id, error))
+                except (OSError, EOFError):
+                    break
+                continue
+            self.requests.put((connection, request_id, sample, perf_counter()))
+
+    def check_sample(self,
+                     sample: Any) -> Optional[Exception]:
+        """
+        Check that a sample can be gathered in a batch.
+
+        :param sample: Sample received from a client.
+        :return: The error to send back to the client, None if the sample is valid.
+        """
+
+        if not isinstance(sample, dict):
+            return TypeError(f"[{self.name}] A sample must be a dict of network fields, got {type(sample)}.")
+        for field in self.network.net_fields:
+            if field not in sample:
+                return KeyError(f"[{self.name}] The sample has no '{field}' field.")
+        for field, value in sample.items():
+            if not isinstance(value, ndarray):
+                return TypeError(f"[{self.name}] The field '{field}' of a sample must be an array, got {type(value)}.")
+        return None
+
+    def serve(self) -> None:
+        """
+        Gather the requests in batches and compute the predictions.
+        """
+
+        while self.running.is_set():
+            try:
+                first_request = self.requests.get(timeout=0.1)
+            except Empty:
+                continue
+
+            # Gather requests until the batch is full or the timeout is reached
+            batch = [first_request]
+            deadline = perf_counter() + self.batch_timeout
+            while len(batch) < self.max_batch_size:
+                remaining_time = deadline - perf_counter()
+                if remaining_time <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining_time))
+                except Empty:
+                    break
+
+            # Samples with different shapes can not be stacked, they are predicted in distinct batches
+            groups: Dict[Tuple, List] = {}
+            for request in batch:
+                key = tuple((field, value.shape) for field, value in sorted(request[2].items()))
+                groups.setdefault(key, []).append(request)
+            for group in groups.values():
+                self.predict_batch(group)
+
+    def predict_batch(self,
+                      batch: List[Tuple[Connection, int, Dict[str, ndarray], float]]) -> None:
+        """
+        Compute the predictions of a batch of requests and send them back to the clients.
+
+        :param batch: List of requests as (connection, request id, sample, arrival time).
+        """
+
+        try:
+            predictions = self.predict([request[2] for request in batch])
+        except Exception as error:
+            predictions = [error] * len(batch)
+
+        # Statistics are recorded before sending so that they are up-to-date when the clients receive the predictions
+        self.batch_sizes.append(len(batch))
+        for (connection, request_id, _, arrival_time), prediction in zip(batch, predictions):
+            self.latencies.append(perf_counter() - arrival_time)
+            try:
+                connection.send((request_id, prediction))
+            except (OSError, EOFError):
+                continue
+
+    def predict(self,
+                samples: List[Dict[str, ndarray]]) -> List[Dict[str, ndarray]]:
+        """
+        Compute the predictions of a list of samples in a single forward pass.
+
+        :param samples: List of samples, each sample is a dict of network fields without batch dimension.
+        :return: List of predictions, each prediction is a dict of prediction fields.
+        """
+
+        # Stack the samples, apply normalization and convert to tensor
+        data_net = {}
+        for field in self.network.net_fields:
+            data = array([sample[field] for sample in samples])
+            if field in self.normalization:
+                data = (data - self.normalization[field][0]) / self.normalization[field][1]
+            data_net[field] = self.network.numpy_to_tensor(data=data, grad=False)
+
+        # Compute prediction
+        data_net = self.data_transformation.transform_before_prediction(data_net)
+        data_pred = self.network.predict(data_net)
+        data_pred, _ = self.data_transformation.transform_before_loss(data_pred)
+        data_pred = self.data_transformation.transform_before_apply(data_pred)
+
+        # Scatter the predictions
+        predictions = [{} for _ in samples]
+        for field in data_pred.keys():
+            data = self.network.tensor_to_numpy(data=data_pred[field])
+            norm_field = self.network.pred_norm_fields.get(field)
+            if norm_field in self.normalization:
+                data = (data * self.normalization[norm_field][1]) + self.normalization[norm_field][0]
+            for i in range(len(samples)):
+                predictions[i][field] = data[i]
+        return predictions
+
+    def get_statistics(self) -> Dict[str, float]:
+        """
+        Get the throughput and the latency percentiles since the last reset.
+
+        :return: Number of samples and batches, throughput in samples per second, mean batch size and latency
+                 percentiles in milliseconds.
+        """
+
+        nb_samples, elapsed_time = sum(self.batch_sizes), perf_counter() - self.start_time
+        latencies = array(self.latencies) * 1e3 if len(self.latencies) > 0 else array([0.])
+        return {'nb_samples': nb_samples,
+                'nb_batches': len(self.batch_sizes),
+                'throughput': nb_samples / elapsed_time,
+                'mean_batch_size': nb_samples / max(len(self.batch_sizes), 1),
+                'latency_p50': float(percentile(latencies, 50)),
+                'latency_p90': float(percentile(latencies, 90)),
+                'latency_p99': float(percentile(latencies, 99))}
+
+    def reset_statistics(self) -> None:
+        """
+        Reset the throughput and latency statistics.
+        """
+
+        self.latencies.clear()
+        self.batch_sizes.clear()
+        self.start_time = perf_counter()
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"# {self.name}\n"
+        description += f"    Address: {self.address}\n"
+        description += f"    Max batch size: {self.max_batch_size}\n"
+        description += f"    Batch timeout: {self.batch_timeout}\n"
+        with self.connections_lock:
+            description += f"    Connected clients: {len(self.connections)}\n"
+        return description
+
+
+class TorchInferenceClient:
+
+    def __init__(self,
+                 address: Tuple[str, int] = ('localhost', 10010),
+                 authkey: Optional[bytes] = None):
+        """
+        TorchInferenceClient sends prediction requests to a TorchInferenceServer.
+
+        :param address: Address of the server.
+        :param authkey: Authentication key of the server.
+        """
+
+        self.connection: Connection = Client(address=address, authkey=authkey)
+        self.request_id: int = 0
+
+    def predict(self,
+                sample: Dict[str, ndarray]) -> Dict[str, ndarray]:
+        """
+        Request a prediction to the server.
+
+        :param sample: Dict of network fields without batch dimension.
+        :return: Dict of prediction fields.
+        """
+
+        self.request_id += 1
+        self.connection.send((self.request_id, sample))
+        request_id, prediction = self.connection.recv()
+        while request_id != self.request_id:
+            request_id, prediction = self.connection.recv()
+        if isinstance(prediction, Exception):
+            raise RuntimeError(f"[{self.__class__.__name__}] Prediction failed on the server: {prediction}") \
+                from prediction
+        return prediction
+
+    def close(self) -> None:
+        """
+        Close the connection with the server.
+        """
+
+        self.connection.close()
@@ -1,19 +1,35 @@
-from typing import Dict
-from os import cpu_count
+from typing import Dict, Optional, Tuple, Callable, Any, List, Mapping
+from os import stat
+from os.path import abspath
 
 import torch
-from numpy import ndarray
-from torch import Tensor, device, set_num_threads, load, save, as_tensor
-from torch.nn import Module
+from numpy import ndarray, ascontiguousarray
+from torch import Tensor, device, load, from_numpy, autocast, no_grad, inference_mode, is_grad_enabled, jit, compile, \
+    cat
+from torch.nn import Module, Linear
+from torch.ao.quantization import quantize_dynamic
 from torch.cuda import is_available, empty_cache
 from gc import collect as gc_collect
 from collections import namedtuple
+from contextlib import nullcontext
+from importlib.util import find_spec
+from inspect import signature
 
 from DeepPhysX.Core.Network.BaseNetwork import BaseNetwork
+from DeepPhysX.Torch.Network.TorchBufferPool import TorchBufferPool
+from DeepPhysX.Torch.Network.TorchCpuPolicy import TorchCpuPolicy
+from DeepPhysX.Torch.Network.TorchDistributed import TorchDistributed
+from DeepPhysX.Torch.Network.TorchCheckpointWriter import TorchCheckpointWriter
+from DeepPhysX.Torch.Network.TorchSharedParameters import TorchSharedParameters
+from DeepPhysX.Torch.Network.TorchTransformation import TorchTransformation
+from DeepPhysX.Torch.Network.TorchOnnxNetwork import TorchOnnxExport
 
 
 class TorchNetwork(Module, BaseNetwork):
 
+    # Maximum number of input shapes with a compiled forward pass, other shapes use the eager forward pass
+    MAX_COMPILED_SHAPES = 8
+
     def __init__(self,
                  config: namedtuple):
         """
@@ -31,11 +47,169 @@ class TorchNetwork(Module, BaseNetwork):
         else:
             torch.set_default_dtype(torch.float32)
 
+        # Mixed precision
+        self.autocast_dtype: Optional[torch.dtype] = None
+        if config.mixed_precision is not None:
+            self.autocast_dtype = getattr(torch, config.mixed_precision)
+
+        # CPU threads policy, applied with the device
+        self.cpu_policy: TorchCpuPolicy = TorchCpuPolicy(nb_threads=config.cpu_threads,
+                                                         nb_interop_threads=config.cpu_interop_threads,
+                                                         affinity=config.cpu_affinity)
+
+        # Persistent transfer buffers, created with the device
+        self.buffer_pool: Optional[TorchBufferPool] = None
+
+        # Compiled forward passes for inference, cached per input shape
+        self.compiled_forwards: Dict[Tuple[Any, ...], Callable[[Tensor], Tensor]] = {}
+
+        # Parameters stacked for predictions without gradients, built again once the parameters are modified
+        self.stacked_parameters: Any = None
+
+        # Checkpoint writer, synchronous unless async_save is set
+        self.checkpoint_writer: TorchCheckpointWriter = TorchCheckpointWriter(
+            asynchronous=config.async_save,
+            max_pending_saves=config.max_pending_saves,
+            keep_last=config.keep_last_checkpoints,
+            file_format=config.checkpoint_format)
+
+        # Parameters shared between processes, set when loading parameters for prediction
+        self.shared_parameters: Optional[TorchSharedParameters] = None
+
+        # Post-training quantization mode, set when the Network is quantized
+        self.quantization: Optional[str] = None
+
+        # Data-parallel training, the process group is created with the device
+        self.distributed: Optional[TorchDistributed] = None
+        if config.distributed is not None:
+            self.distributed = TorchDistributed(backend=config.distributed)
+
+        # Training batches predicted by micro-batches, recomputed with gradients in the backward pass
+        self.micro_batches: Optional[Tuple[Tensor, Tensor]] = None
+        self.pred_batch_dim: int = 0
+
+        # Optimization step applying the pending accumulated gradients, set by the optimization
+        self.flush_gradients: Optional[Callable[[], None]] = None
+
         # Data fields
         self.net_fields = ['input']
         self.opt_fields = ['ground_truth']
         self.pred_fields = ['prediction']
 
+    def predict(self,
+                data_net: Dict[str, Tensor]) -> Dict[str, Tensor]:
+        """
+        Compute a forward pass of the Network. With mixed precision, the forward pass runs under autocast and the
+        prediction is cast back to the data type. In eval mode, the forward pass runs in inference mode (no autograd
+        record) and uses the compiled forward pass for the input shape if compiled inference is enabled. With 'auto' CPU
+        threads, the number of threads is tuned on the first prediction in eval mode. Training batches larger than
+        micro_batch_size are predicted by micro-batches.
+
+        :param data_net: Data used by the Network.
+        :return: Data produced by the Network.
+        """
+
+        input_data = data_net['input']
+        if self.training and is_grad_enabled() and self.config.micro_batch_size is not None and \
+                input_data.shape[0] > self.config.micro_batch_size:
+            return {'prediction': self.predict_micro_batches(input_data)}
+        return {'prediction': self.forward_prediction(input_data)}
+
+    def forward_prediction(self,
+                           input_data: Tensor) -> Tensor:
+        """
+        Compute a forward pass of the Network with the prediction settings (mixed precision, inference mode, compiled
+        forward pass, CPU threads tuning).
+
+        :param input_data: Input tensor.
+        :return: Network prediction.
+        """
+
+        device_type = 'cpu' if self.device is None else self.device.type
+        grad_context = nullcontext() if self.training else inference_mode()
+        cast_context = nullcontext() if self.autocast_dtype is None else autocast(device_type=device_type,
+                                                                                  dtype=self.autocast_dtype)
+        with grad_context, cast_context:
+            if device_type == 'cpu' and self.cpu_policy.tuning_required(self.training):
+                self.cpu_policy.tune(lambda: self.forward(input_data))
+            if self.config.compile_inference is not None and not self.training:
+                prediction = self.get_compiled_forward(input_data)(input_data)
+            else:
+                prediction = self.forward(input_data)
+        if self.autocast_dtype is not None:
+            prediction = prediction.to(torch.get_default_dtype())
+        return prediction
+
+    def predict_micro_batches(self,
+                              input_data: Tensor) -> Tensor:
+        """
+        Compute the prediction of a training batch by micro-batches of micro_batch_size samples, without storing the
+        activations. The prediction is a leaf tensor, its gradients are back-propagated in the Network by
+        backward_micro_batches, so that only the activations of one micro-batch are stored at a time.
+
+        :param input_data: Input tensor.
+        :return: Network prediction.
+        """
+
+        with no_grad():
+            prediction = cat([self.forward_prediction(micro_input)
+                              for micro_input in input_data.split(self.config.micro_batch_size)],
+                             dim=self.pred_batch_dim)
+        prediction.requires_grad_()
+        self.micro_batches = (input_data, prediction)
+        return prediction
+
+    def backward_micro_batches(self) -> None:
+        """
+        Recompute the forward pass of each micro-batch of the last training prediction with gradients, then
+        back-propagate the gradients of the prediction.
+        """
+
+        if self.micro_batches is None:
+            return
+        input_data, prediction = self.micro_batches
+        self.micro_batches = None
+        if prediction.grad is None:
+            return
+
+        # Buffers (e.g. normalization running statistics) were already updated by the prediction
+        buffers = [buffer.clone() for buffer in self.buffers()]
+        gradients = prediction.grad.split(self.config.micro_batch_size, dim=self.pred_batch_dim)
+        for micro_input, gradient in zip(input_data.split(self.config.micro_batch_size), gradients):
+            self.forward_prediction(micro_input).backward(gradient)
+        with no_grad():
+            for buffer, saved_buffer in zip(self.buffers(), buffers):
+                buffer.copy_(saved_buffer)
+
+    def get_compiled_forward(self,
+                             input_data: Tensor) -> Callable[[Tensor], Tensor]:
+        """
+        Get the compiled forward pass for the shape of the input data, compile it at the first call. Falls back to the
+        eager forward pass when the compilation fails or when MAX_COMPILED_SHAPES shapes were already compiled.
+
+        :param input_data: Input tensor.
+        :return: Forward pass function.
+        """
+
+        key = (tuple(input_data.shape), input_data.dtype, input_data.device)
+        if key not in self.compiled_forwards:
+            if len(self.compiled_forwards) >= self.MAX_COMPILED_SHAPES:
+                return self.forward
+            try:
+                with no_grad():
+                    if self.config.compile_inference == 'trace':
+                        compiled_forward = jit.freeze(jit.trace(self, input_data))
+                    else:
+                        compiled_forward = compile(self.forward, dynamic=False)
+                    # Run once to trigger the compilation
+                    compiled_forward(input_data)
+            except Exception as error:
+                print(f"[{self.__class__.__name__}] Compilation failed for input shape {key[0]}, using eager forward "
+                      f"pass: {error}")
+                compiled_forward = self.forward
+            self.compiled_forwards[key] = compiled_forward
+        return self.compiled_forwards[key]
+
     def forward(self,
                 input_data: Tensor) -> Tensor:
         """
@@ -56,10 +230,12 @@ class TorchNetwork(Module, BaseNetwork):
 
     def set_eval(self) -> None:
         """
-         Set the Network in eval mode (does not compute gradient).
+         Set the Network in eval mode (does not compute gradient, predictions run in inference mode).
          """
 
         self.eval()
+        self.compiled_forwards.clear()
+        self.reset_stacked_parameters()
 
     def set_device(self) -> None:
         """
@@ -67,14 +243,27 @@ class TorchNetwork(Module, BaseNetwork):
         """
 
         if is_available():
-            self.device = device('cuda')
+            # Each process of a data-parallel training uses its own GPU
+            self.device = device('cuda') if self.distributed is None else device(f'cuda:{self.distributed.local_rank}')
             # Garbage collector run
             gc_collect()
             empty_cache()
         else:
             self.device = device('cpu')
-            set_num_threads(cpu_count() - 1)
+            # The CPUs of the host are shared between the processes of a data-parallel training
+            if self.distributed is not None and self.config.cpu_threads is None:
+                nb_cpus = TorchCpuPolicy.available_cpus()
+                self.cpu_policy.nb_threads = max(1, nb_cpus // self.distributed.local_world_size)
+            self.cpu_policy.apply()
         self.to(self.device)
+        self.reset_stacked_parameters()
+        # Arrays are converted without copy on CPU, the buffers are only useful for transfers to a GPU
+        if self.config.buffer_pool and self.device.type != 'cpu':
+            self.buffer_pool = TorchBufferPool(target_device=self.device)
+        # All the processes start from the parameters of the main process
+        if self.distributed is not None:
+            self.distributed.setup()
+            self.distributed.broadcast_parameters(self)
         print(f"[{self.__class__.__name__}]: Device is {self.device}")
 
     def load_parameters(self,
@@ -85,7 +274,97 @@ class TorchNetwork(Module, BaseNetwork):
         :param path: Path to Network parameters to load.
         """
 
-        self.load_state_dict(load(path, map_location=self.device))
+        # The file might still be written by a pending save
+        self.checkpoint_writer.wait()
+        if self.config.shared_memory_name is not None and not self.training and \
+                (self.device is None or self.device.type == 'cpu'):
+            self.load_shared_parameters(path)
+        else:
+            self.load_state_dict(self.read_parameters(path))
+        self.compiled_forwards.clear()
+
+    def read_parameters(self,
+                        path: str) -> Dict[str, Tensor]:
+        """
+        Read network parameters from path.
+        The file is memory-mapped, tensors are read on demand while being copied in the existing parameters.
+
+        :param path: Path to Network parameters to read.
+        :return: Network parameters.
+        """
+
+        if path.endswith('.safetensors'):
+            from safetensors.torch import load_file
+            return load_file(path, device='cpu')
+        return load(path, map_location='cpu', mmap=True, weights_only=True)
+
+    def load_shared_parameters(self,
+                               path: str) -> None:
+        """
+        Attach the network parameters to the shared memory segment. If the segment does not exist yet, parameters are
+        loaded from path then published in the segment. A segment published from another file (or from another
+        version of the file) is refused. Shared parameters are writable views of the segment and must not be modified,
+        since an in-place modification is seen by all the processes.
+
+        :param path: Path to Network parameters to load.
+        """
+
+        file_stat = stat(path)
+        source = {'path': abspath(path), 'size': file_stat.st_size, 'mtime': file_stat.st_mtime_ns}
+        self.shared_parameters = TorchSharedParameters(name=self.config.shared_memory_name)
+        try:
+            shared_state_dict = self.shared_parameters.attach(source=source)
+        except FileNotFoundError:
+            self.load_state_dict(self.read_parameters(path))
+            try:
+                shared_state_dict = self.shared_parameters.publish(self.state_dict(), source=source)
+            except FileExistsError:
+                # Another process published the parameters in the meantime
+                shared_state_dict = self.shared_parameters.attach(source=source)
+
+        # Parameters become views of the shared memory segment
+        self.load_state_dict(shared_state_dict, assign=True)
+        self.requires_grad_(False)
+
+    def load_state_dict(self,
+                        state_dict: Mapping[str, Any],
+                        strict: bool = True,
+                        assign: bool = False) -> Any:
+        """
+        Copy parameters and buffers from state_dict into the Network, then reset the stacked parameters.
+
+        :param state_dict: Parameters and buffers to load.
+        :param strict: Whether the keys of state_dict must exactly match the keys of the Network.
+        :param assign: Whether to assign the tensors of state_dict instead of copying them.
+        :return: Missing and unexpected keys.
+        """
+
+        keys = Module.load_state_dict(self, state_dict, strict=strict, assign=assign)
+        self.reset_stacked_parameters()
+        return keys
+
+    def get_stacked_parameters(self,
+                               stack: Callable[[], Any]) -> Any:
+        """
+        Get the parameters stacked for predictions without gradients. They are only stacked again after a
+        modification of the parameters (optimizer step, loading, device change or eval mode). Parameters modified
+        directly require a call to reset_stacked_parameters.
+
+        :param stack: Function stacking the parameters.
+        :return: Stacked parameters.
+        """
+
+        if self.stacked_parameters is None:
+            with no_grad():
+                self.stacked_parameters = stack()
+        return self.stacked_parameters
+
+    def reset_stacked_parameters(self) -> None:
+        """
+        Notify the Network that its parameters were modified, so that stacked parameters are built again.
+        """
+
+        self.stacked_parameters = None
 
     def get_parameters(self) -> Dict[str, Tensor]:
         """
@@ -99,13 +378,126 @@ class TorchNetwork(Module, BaseNetwork):
     def save_parameters(self,
                         path: str) -> None:
         """
-        Saves the network parameters to the path location.
+        Saves the network parameters to the path location. In a data-parallel training, all the processes must call
+        this method since the buffers are averaged between them.
 
         :param path: Path where to save the parameters.
         """
 
-        path = path + '.pth'
-        save(self.state_dict(), path)
+        # Parameters are identical in all the processes of a data-parallel training, buffers (e.g. normalization
+        # running statistics) are computed on each shard and averaged, then only the main process saves them
+        # Gradients accumulated since the last optimizer step are applied first (e.g. at the end of an epoch)
+        if self.flush_gradients is not None:
+            self.flush_gradients()
+        if self.distributed is not None:
+            self.distributed.average_buffers(self)
+            if not self.distributed.is_main:
+                return
+        path = path + '.' + self.config.checkpoint_format
+        self.checkpoint_writer.save(self.state_dict(), path)
+
+    def wait_saves(self) -> None:
+        """
+        Wait for the pending asynchronous saves to complete.
+        """
+
+        self.checkpoint_writer.wait()
+
+    def quantize(self,
+                 samples: Optional[List[Tensor]] = None) -> Dict[str, float]:
+        """
+        Apply a post-training dynamic int8 quantization on the Linear layers: weights are quantized once, activations
+        are quantized at each prediction. The parameters must be loaded before since the quantized Network no longer
+        matches the saved parameters. Quantized predictions run on CPU only.
+
+        :param samples: Input tensors used to measure the drift of the quantized predictions.
+        :return: Maximal, mean and relative prediction errors of the quantized Network on the samples.
+        """
+
+        references = self.prepare_quantization(samples)
+        quantize_dynamic(self, {Linear}, dtype=torch.qint8, inplace=True)
+        self.quantization = 'dynamic'
+        return self.quantization_drift(samples, references)
+
+    def prepare_quantization(self,
+                             samples: Optional[List[Tensor]] = None) -> List[Tensor]:
+        """
+        Check that the Network can be quantized and compute the float predictions on the samples.
+
+        :param samples: Input tensors used to measure the drift of the quantized predictions.
+        :return: Float predictions on the samples.
+        """
+
+        if self.quantization is not None:
+            raise ValueError(f"[{self.__class__.__name__}] The Network is already quantized.")
+        if self.device is not None and self.device.type != 'cpu':
+            raise ValueError(f"[{self.__class__.__name__}] Quantized Networks run on CPU only, get {self.device}.")
+        if self.config.data_type != 'float32':
+            raise ValueError(f"[{self.__class__.__name__}] Quantization requires 'float32' data type, get "
+                             f"{self.config.data_type}.")
+        self.set_eval()
+        with inference_mode():
+            return [] if samples is None else [self.forward(sample) for sample in samples]
+
+    def quantization_drift(self,
+                           samples: Optional[List[Tensor]],
+                           references: List[Tensor]) -> Dict[str, float]:
+        """
+        Compare the quantized predictions to the float predictions.
+
+        :param samples: Input tensors.
+        :param references: Float predictions on the samples.
+        :return: Maximal, mean and relative prediction errors of the quantized Network on the samples.
+        """
+
+        self.compiled_forwards.clear()
+        self.reset_stacked_parameters()
+        drift = {'max_error': 0., 'mean_error': 0., 'relative_error': 0.}
+        if samples is None or len(samples) == 0:
+            return drift
+        with inference_mode():
+            errors = [(self.forward(sample) - reference, reference) for sample, reference in zip(samples, references)]
+        drift['max_error'] = max(error.abs().max().item() for error, _ in errors)
+        drift['mean_error'] = sum(error.abs().mean().item() for error, _ in errors) / len(errors)
+        drift['relative_error'] = (sum(error.square().sum().item() for error, _ in errors) /
+                                   max(sum(reference.square().sum().item() for _, reference in errors), 1e-12)) ** 0.5
+        print(f"[{self.__class__.__name__}] Quantization drift: maximal error {drift['max_error']:.3e}, mean error "
+              f"{drift['mean_error']:.3e}, relative error {drift['relative_error']:.3e}")
+        return drift
+
+    def export_onnx(self,
+                    path: str,
+                    data_transformation: TorchTransformation,
+                    sample: Tensor,
+                    opset_version: Optional[int] = None) -> str:
+        """
+        Export the transformations and the forward pass of the Network to an ONNX graph with a dynamic batch axis. The
+        exported graph takes the same input as the Network and returns the predictions as applied in the Environment.
+        It can be run with a TorchOnnxNetwork. Requires the onnx package.
+
+        :param path: Path where to save the exported graph.
+        :param data_transformation: Transformation applied on data before and after predictions.
+        :param sample: Input tensor used to trace the graph.
+        :param opset_version: ONNX operator set version, the default one of the exporter if not set.
+        :return: Path of the exported graph.
+        """
+
+        if find_spec('onnx') is None:
+            raise ImportError(f"[{self.__class__.__name__}] ONNX export requires the onnx package: pip install onnx")
+        path = path if path.endswith('.onnx') else path + '.onnx'
+        self.set_eval()
+        module = TorchOnnxExport(network=self, data_transformation=data_transformation).eval()
+        with no_grad():
+            module(sample)
+        # Recent exporters use the dynamo exporter by default, which does not support dynamic_axes the same way
+        export_kwargs = {'dynamo': False} if 'dynamo' in signature(torch.onnx.export).parameters else {}
+        torch.onnx.export(module, (sample,), path,
+                          input_names=['input'],
+                          output_names=module.pred_fields,
+                          dynamic_axes={name: {0: 'batch'} for name in ['input', *module.pred_fields]},
+                          opset_version=opset_version,
+                          **export_kwargs)
+        return path
 
     def nb_parameters(self) -> int:
         """
@@ -121,27 +513,51 @@ class TorchNetwork(Module, BaseNetwork):
                         grad: bool = True) -> Tensor:
         """
         Transform and cast data from numpy to the desired tensor type.
+        If the array already has the right data type and is contiguous, the tensor shares its memory on CPU.
+        With the buffer pool, the data is copied in persistent buffers and the tensor is overwritten by later calls.
+        In a data-parallel training, the arrays converted with gradients in train mode are training batches: they are
+        sharded on their first dimension, so the inputs and the ground truth must share the same grad flag.
 
         :param data: Array data to convert.
-        :param grad: If True, gradient will record operations on this tensor.
+        :param grad: If True, gradient will record operations on this tensor (only in train mode).
         :return: Converted tensor.
         """
 
-        data = as_tensor(data.astype(self.config.data_type), device=self.device)
-        if grad:
+        # Each process of a data-parallel training gets a shard of the training batches
+        if self.distributed is not None and grad and self.training:
+            data = self.distributed.shard(data)
+        if self.buffer_pool is not None:
+            data = self.buffer_pool.transfer(data=ascontiguousarray(data), data_type=self.config.data_type)
+        else:
+            # Only copy the array if its data type or memory layout does not match
+            data = ascontiguousarray(data, dtype=self.config.data_type)
+            if not data.flags.writeable:
+                data = data.copy()
+            data = from_numpy(data)
+            if self.device is not None and self.device.type != 'cpu':
+                data = data.to(self.device, non_blocking=True)
+        # Inputs never record autograd history in eval mode
+        if grad and self.training:
             data.requires_grad_()
         return data
 
     def tensor_to_numpy(self,
-                        data: Tensor) -> ndarray:
+                        data: Tensor,
+                        out: Optional[ndarray] = None) -> ndarray:
         """
         Transform and cast data from tensor type to numpy.
+        If the tensor is already on CPU with the right data type, the array shares its memory.
 
         :param data: Tensor to convert.
+        :param out: Preallocated array in which the data will be copied.
         :return: Converted array.
         """
 
-        return data.cpu().detach().numpy().astype(self.config.data_type)
+        data = data.detach()
+        if out is not None:
+            from_numpy(out).copy_(data)
+            return out
+        return data.cpu().numpy().astype(self.config.data_type, copy=False)
 
     @staticmethod
     def print_architecture(architecture) -> str:
@@ -161,4 +577,14 @@ class TorchNetwork(Module, BaseNetwork):
 
         description = BaseNetwork.__str__(self)
         description += f"    Device: {self.device}\n"
+        description += f"    CPU threads: {self.config.cpu_threads}\n"
+        description += f"    Mixed precision: {self.config.mixed_precision}\n"
+        description += f"    Compiled inference: {self.config.compile_inference}\n"
+        description += f"    Micro-batch size: {self.config.micro_batch_size}\n"
+        description += f"    Asynchronous save: {self.config.async_save}\n"
+        description += f"    Shared memory: {self.config.shared_memory_name}\n"
+        description += f"    Quantization: {self.quantization}\n"
+        if self.distributed is not None:
+            description += f"    Distributed: {self.distributed.backend} (rank {self.distributed.rank} / " \
+                           f"{self.distributed.world_size})\n"
         return description
@@ -1,6 +1,9 @@
-from typing import Any, Optional, Type
+from typing import Any, Optional, Type, List, Tuple, Dict, Union
+from importlib.util import find_spec
+from torch import Tensor
 
 from DeepPhysX.Core.Network.BaseNetworkConfig import BaseNetworkConfig, BaseNetwork, BaseOptimization, BaseTransformation
+from DeepPhysX.Core.Utils.configs import make_config
 from DeepPhysX.Torch.Network.TorchTransformation import TorchTransformation
 from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
 from DeepPhysX.Torch.Network.TorchOptimization import TorchOptimization
@@ -21,7 +24,26 @@ class TorchNetworkConfig(BaseNetworkConfig):
                  lr: Optional[float] = None,
                  require_training_stuff: bool = True,
                  loss: Optional[Any] = None,
-                 optimizer: Optional[Any] = None):
+                 optimizer: Optional[Any] = None,
+                 mixed_precision: Optional[str] = None,
+                 buffer_pool: bool = False,
+                 compile_inference: Optional[str] = None,
+                 accumulation_steps: int = 1,
+                 micro_batch_size: Optional[int] = None,
+                 loss_report_steps: int = 1,
+                 async_save: bool = False,
+                 max_pending_saves: int = 1,
+                 keep_last_checkpoints: Optional[int] = None,
+                 checkpoint_format: str = 'pth',
+                 shared_memory_name: Optional[str] = None,
+                 cpu_threads: Optional[Union[int, str]] = None,
+                 cpu_interop_threads: Optional[int] = None,
+                 cpu_affinity: Optional[List[int]] = None,
+                 distributed: Optional[str] = None,
+                 shard_optimizer: bool = False,
+                 optimizer_kwargs: Optional[Dict[str, Any]] = None,
+                 scheduler: Any = None,
+                 scheduler_kwargs: Optional[Dict[str, Any]] = None):
         """
         TorchNetworkConfig is a configuration class to parameterize and create TorchNetwork, TorchOptimization and
         TorchTransformation for the NetworkManager.
@@ -40,6 +62,51 @@ class TorchNetworkConfig(BaseNetworkConfig):
         :param require_training_stuff: If specified, loss and optimizer class can be not necessary for training.
         :param loss: Loss class.
         :param optimizer: Network's parameters optimizer class.
+        :param mixed_precision: If specified, forward passes run under autocast with this reduced precision type
+                                (either 'float16' or 'bfloat16', the latest being the one supported on CPU).
+        :param buffer_pool: If True, arrays are converted to tensors through persistent (pinned) buffers allocated
+                            once for each batch shape. Only used with a GPU, arrays are converted without copy on CPU.
+        :param compile_inference: If specified, forward passes in eval mode are compiled for each input shape, either
+                                  with a frozen TorchScript trace ('trace') or with torch.compile ('compile').
+        :param accumulation_steps: Number of batches over which gradients are accumulated before each optimizer step.
+                                   The reported loss is the mean loss of the accumulated batches. Pending gradients
+                                   are applied before saving the parameters (e.g. at the end of an epoch).
+        :param micro_batch_size: Maximal number of samples in a forward pass of a training batch. Larger batches are
+                                 predicted without storing activations, then each micro-batch is recomputed with
+                                 gradients in the optimization step.
+        :param loss_report_steps: Number of steps for which loss values are kept on the device before being transferred
+                                  to the host. Reported loss values are the mean of the last transferred ones.
+        :param async_save: If True, parameters are copied to host memory then written from a background thread.
+        :param max_pending_saves: Maximum number of saves in progress with async_save.
+        :param keep_last_checkpoints: If set, only the last saved sets of parameters are kept.
+        :param checkpoint_format: File format of the saved parameters, either 'pth' or 'safetensors' (requires the
+                                  safetensors package). Both formats are memory-mapped when loaded.
+        :param shared_memory_name: If set, parameters loaded for prediction on CPU are stored in the shared memory
+                                   segment with this name. The first process publishes the parameters, other processes
+                                   on the same host attach to the segment instead of holding their own copy. A segment
+                                   published from another parameters file is refused.
+        :param cpu_threads: Number of threads for CPU computations. If None, all the CPUs available for the process
+                            (affinity and container quota) but one are used. If 'auto', the number of threads is tuned
+                            on the first prediction.
+        :param cpu_interop_threads: Number of inter-op threads for CPU computations. If None, PyTorch default is used.
+        :param cpu_affinity: List of CPUs on which the process is pinned.
+        :param distributed: If specified, the Network is trained in data-parallel on several processes launched
+                            with torchrun, with this torch.distributed backend (either 'gloo', 'nccl' or 'mpi').
+                            Every array converted with gradients in train mode (the network and optimization fields
+                            of the training batches) must be batch-major: it is split on its first dimension between
+                            the processes, so the inputs and the ground truth must be converted with the same grad
+                            flag to keep their samples aligned.
+        :param shard_optimizer: If True, the optimizer state is sharded between the processes of the data-parallel
+                                training instead of being replicated in each process. The optimizer state is not
+                                saved with the parameters: the caller saves it with
+                                TorchOptimization.get_optimizer_state and restores it with
+                                TorchOptimization.load_optimizer_state, both being called on every process.
+        :param optimizer_kwargs: Additional arguments of the optimizer. With a weight decay, parameters with less than
+                                 two dimensions (biases, normalization and activation parameters) are not decayed.
+                                 The fused or multi-tensor implementation is used unless 'fused' or 'foreach' is set.
+        :param scheduler: Learning rate scheduler class, stepped after each optimizer step. A ReduceLROnPlateau
+                          scheduler is stepped with the reported loss values, every loss_report_steps steps.
+        :param scheduler_kwargs: Arguments of the learning rate scheduler.
         """
 
         BaseNetworkConfig.__init__(self,
@@ -57,6 +124,117 @@ class TorchNetworkConfig(BaseNetworkConfig):
                                    loss=loss,
                                    optimizer=optimizer)
 
+        # Check mixed precision value
+        if mixed_precision not in [None, 'float16', 'bfloat16']:
+            raise ValueError(f"[{self.__class__.__name__}] 'mixed_precision' must be in [None, 'float16', 'bfloat16'], "
+                             f"get {mixed_precision}")
+        # Check buffer pool type
+        if type(buffer_pool) != bool:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'buffer_pool' type: bool required, get "
+                            f"{type(buffer_pool)}")
+        # Check compiled inference value
+        if compile_inference not in [None, 'trace', 'compile']:
+            raise ValueError(f"[{self.__class__.__name__}] 'compile_inference' must be in [None, 'trace', 'compile'], "
+                             f"get {compile_inference}")
+        # Check gradient accumulation types and values
+        for value, value_name in zip([accumulation_steps, micro_batch_size],
+                                     ['accumulation_steps', 'micro_batch_size']):
+            if value is not None and type(value) != int:
+                raise TypeError(f"[{self.__class__.__name__}] Wrong '{value_name}' type: int required, get "
+                                f"{type(value)}")
+            if value is not None and value < 1:
+                raise ValueError(f"[{self.__class__.__name__}] '{value_name}' must be positive")
+        # Check loss report steps type and value
+        if type(loss_report_steps) != int:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'loss_report_steps' type: int required, get "
+                            f"{type(loss_report_steps)}")
+        if loss_report_steps < 1:
+            raise ValueError(f"[{self.__class__.__name__}] 'loss_report_steps' must be positive")
+        # Check async save type
+        if type(async_save) != bool:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'async_save' type: bool required, get "
+                            f"{type(async_save)}")
+        # Check max pending saves type and value
+        if type(max_pending_saves) != int:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'max_pending_saves' type: int required, get "
+                            f"{type(max_pending_saves)}")
+        if max_pending_saves < 1:
+            raise ValueError(f"[{self.__class__.__name__}] 'max_pending_saves' must be positive")
+        # Check keep last checkpoints type and value
+        if keep_last_checkpoints is not None:
+            if type(keep_last_checkpoints) != int:
+                raise TypeError(f"[{self.__class__.__name__}] Wrong 'keep_last_checkpoints' type: int required, get "
+                                f"{type(keep_last_checkpoints)}")
+            if keep_last_checkpoints < 1:
+                raise ValueError(f"[{self.__class__.__name__}] 'keep_last_checkpoints' must be positive")
+        # Check checkpoint format value
+        if checkpoint_format not in ['pth', 'safetensors']:
+            raise ValueError(f"[{self.__class__.__name__}] 'checkpoint_format' must be in ['pth', 'safetensors'], "
+                             f"get {checkpoint_format}")
+        if checkpoint_format == 'safetensors' and find_spec('safetensors') is None:
+            raise ImportError(f"[{self.__class__.__name__}] 'safetensors' checkpoint format requires the safetensors "
+                              f"package: pip install safetensors")
+        # Check shared memory name type
+        if shared_memory_name is not None and type(shared_memory_name) != str:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'shared_memory_name' type: str required, get "
+                            f"{type(shared_memory_name)}")
+        # Check CPU threads types and values
+        if cpu_threads is not None and cpu_threads != 'auto' and (type(cpu_threads) != int or cpu_threads < 1):
+            raise ValueError(f"[{self.__class__.__name__}] 'cpu_threads' must be None, 'auto' or a positive int, get "
+                             f"{cpu_threads}")
+        if cpu_interop_threads is not None and (type(cpu_interop_threads) != int or cpu_interop_threads < 1):
+            raise ValueError(f"[{self.__class__.__name__}] 'cpu_interop_threads' must be None or a positive int, get "
+                             f"{cpu_interop_threads}")
+        # Check CPU affinity type
+        if cpu_affinity is not None and (type(cpu_affinity) != list or any(type(cpu) != int for cpu in cpu_affinity)):
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'cpu_affinity' type: List[int] required, get "
+                            f"{cpu_affinity}")
+        # Check distributed backend
+        if distributed not in [None, 'gloo', 'nccl', 'mpi']:
+            raise ValueError(f"[{self.__class__.__name__}] 'distributed' must be in [None, 'gloo', 'nccl', 'mpi'], get "
+                             f"{distributed}")
+        # Check optimizer sharding
+        if type(shard_optimizer) != bool:
+            raise TypeError(f"[{self.__class__.__name__}] Wrong 'shard_optimizer' type: bool required, get "
+                            f"{type(shard_optimizer)}")
+        if shard_optimizer and distributed is None:
+            raise ValueError(f"[{self.__class__.__name__}] 'shard_optimizer' requires a 'distributed' training.")
+        # Check optimizer and scheduler arguments
+        for value_name, value in zip(['optimizer_kwargs', 'scheduler_kwargs'], [optimizer_kwargs, scheduler_kwargs]):
+            if value is not None and type(value) != dict:
+                raise TypeError(f"[{self.__class__.__name__}] Wrong '{value_name}' type: dict required, get "
+                                f"{type(value)}")
+        if optimizer_kwargs is not None and 'lr' in optimizer_kwargs:
+            raise ValueError(f"[{self.__class__.__name__}] Learning rate must be given with 'lr', not in "
+                             f"'optimizer_kwargs'.")
+
+        # Define specific TorchNetwork configuration
+        self.network_config = make_config(configuration_object=self,
+                                          configuration_name='network_config',
+                                          mixed_precision=mixed_precision,
+                                          buffer_pool=buffer_pool,
+                                          compile_inference=compile_inference,
+                                          async_save=async_save,
+                                          max_pending_saves=max_pending_saves,
+                                          keep_last_checkpoints=keep_last_checkpoints,
+                                          checkpoint_format=checkpoint_format,
+                                          shared_memory_name=shared_memory_name,
+                                          cpu_threads=cpu_threads,
+                                          cpu_interop_threads=cpu_interop_threads,
+                                          cpu_affinity=cpu_affinity,
+                                          distributed=distributed,
+                                          micro_batch_size=micro_batch_size)
+
+        # Define specific TorchOptimization configuration
+        self.optimization_config = make_config(configuration_object=self,
+                                               configuration_name='optimization_config',
+                                               accumulation_steps=accumulation_steps,
+                                               loss_report_steps=loss_report_steps,
+                                               shard_optimizer=shard_optimizer,
+                                               optimizer_kwargs=optimizer_kwargs,
+                                               scheduler=scheduler,
+                                               scheduler_kwargs=scheduler_kwargs)
+
     def create_network(self) -> BaseNetwork:
         """
         Create an instance of network_class with given parameters.
@@ -83,3 +261,22 @@ class TorchNetworkConfig(BaseNetworkConfig):
         """
 
         return BaseNetworkConfig.create_data_transformation(self)
+
+    def create_quantized_network(self,
+                                 path: Optional[str] = None,
+                                 samples: Optional[List[Tensor]] = None) -> Tuple[BaseNetwork, Dict[str, float]]:
+        """
+        Create an instance of network_class in eval mode on CPU, load its parameters then quantize it.
+        Networks with Linear layers use a dynamic quantization, UNet uses a static quantization calibrated on samples.
+
+        :param path: Path to Network parameters to load.
+        :param samples: Input tensors used to calibrate the quantization and to measure the prediction drift.
+        :return: Quantized TorchNetwork object and its prediction errors on the samples.
+        """
+
+        network = self.create_network()
+        network.set_eval()
+        if path is not None:
+            network.load_parameters(path)
+        drift = network.quantize(samples)
+        return network, drift
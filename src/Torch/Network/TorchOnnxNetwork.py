@@ -0,0 +1,191 @@
+from typing import Any, Dict, List, Optional, Tuple
+from numpy import ndarray, ascontiguousarray
+from torch import Tensor
+from torch.nn import Module
+from collections import namedtuple
+
+from DeepPhysX.Core.Network.BaseNetwork import BaseNetwork
+from DeepPhysX.Torch.Network.TorchTransformation import TorchTransformation
+
+
+class TorchOnnxNetwork(BaseNetwork):
+
+    def __init__(self,
+                 config: namedtuple):
+        """
+        TorchOnnxNetwork computes predictions with a Network exported by TorchNetwork.export_onnx and run by ONNX
+        Runtime. The exported graph already contains the transformations of the TorchTransformation, so it must be used
+        with an identity BaseTransformation. It can only be used for predictions and requires the onnxruntime package.
+
+        :param config: Set of TorchNetwork parameters.
+        """
+
+        BaseNetwork.__init__(self, config)
+
+        # ONNX Runtime session, created when loading the exported graph
+        self.session: Any = None
+        self.providers: List[str] = ['CPUExecutionProvider']
+
+    def predict(self,
+                data_net: Dict[str, ndarray]) -> Dict[str, ndarray]:
+        """
+        Compute a forward pass of the exported graph.
+
+        :param data_net: Data used by the Network.
+        :return: Data produced by the Network.
+        """
+
+        outputs = self.session.run(None, {'input': data_net['input']})
+        return dict(zip(self.pred_fields, outputs))
+
+    def forward(self,
+                input_data: ndarray) -> ndarray:
+        """
+        Compute a forward pass of the exported graph.
+
+        :param input_data: Input array.
+        :return: Network prediction.
+        """
+
+        return self.session.run(None, {'input': input_data})[0]
+
+    def set_train(self) -> None:
+        """
+        Exported graphs can not be trained.
+        """
+
+        raise ValueError(f"[{self.__class__.__name__}] An exported Network can only be used for predictions.")
+
+    def set_eval(self) -> None:
+        """
+        Set the Network in prediction mode, exported graphs are always in prediction mode.
+        """
+
+        pass
+
+    def set_device(self) -> None:
+        """
+        Set the ONNX Runtime execution providers, a GPU is used if available.
+        """
+
+        from onnxruntime import get_available_providers
+        if 'CUDAExecutionProvider' in get_available_providers():
+            self.device = 'cuda'
+            self.providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
+        else:
+            self.device = 'cpu'
+            self.providers = ['CPUExecutionProvider']
+        print(f"[{self.__class__.__name__}]: Device is {self.device}")
+
+    def load_parameters(self,
+                        path: str) -> None:
+        """
+        Create the ONNX Runtime session of an exported graph.
+
+        :param path: Path to the exported graph.
+        """
+
+        try:
+            from onnxruntime import InferenceSession, SessionOptions, GraphOptimizationLevel
+        except ImportError:
+            raise ImportError(f"[{self.__class__.__name__}] Exported Networks require the onnxruntime package: "
+                              f"pip install onnxruntime")
+        options = SessionOptions()
+        options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = InferenceSession(path, sess_options=options, providers=self.providers)
+        self.pred_fields = [output.name for output in self.session.get_outputs()]
+        self.pred_norm_fields = {field: self.pred_norm_fields.get(field, 'ground_truth') for field in self.pred_fields}
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        Parameters of an exported graph are not accessible.
+
+        :return: Empty set of parameters.
+        """
+
+        return {}
+
+    def save_parameters(self,
+                        path: str) -> None:
+        """
+        Exported graphs can not be saved, they are produced by TorchNetwork.export_onnx.
+
+        :param path: Path where to save the parameters.
+        """
+
+        raise ValueError(f"[{self.__class__.__name__}] An exported Network can not be saved, use "
+                         f"TorchNetwork.export_onnx instead.")
+
+    def nb_parameters(self) -> int:
+        """
+        Return the number of parameters of the network, not accessible for exported graphs.
+
+        :return: Number of parameters.
+        """
+
+        return 0
+
+    def numpy_to_tensor(self,
+                        data: ndarray,
+                        grad: bool = True) -> ndarray:
+        """
+        Cast data to the desired data type, ONNX Runtime directly works on arrays.
+
+        :param data: Array data to convert.
+        :param grad: Unused, exported graphs do not compute gradients.
+        :return: Converted array.
+        """
+
+        return ascontiguousarray(data, dtype=self.config.data_type)
+
+    def tensor_to_numpy(self,
+                        data: ndarray) -> ndarray:
+        """
+        Cast data to the desired data type, ONNX Runtime directly works on arrays.
+
+        :param data: Array to convert.
+        :return: Converted array.
+        """
+
+        return data.astype(self.config.data_type, copy=False)
+
+    def __str__(self) -> str:
+
+        description = BaseNetwork.__str__(self)
+        description += f"    Device: {self.device}\n"
+        description += f"    Execution providers: {self.providers}\n"
+        return description
+
+
+class TorchOnnxExport(Module):
+
+    def __init__(self,
+                 network: Module,
+                 data_transformation: TorchTransformation):
+        """
+        TorchOnnxExport gathers the transformations and the forward pass of a Network in a single Module to export.
+
+        :param network: TorchNetwork to export.
+        :param data_transformation: Transformation applied on data before and after predictions.
+        """
+
+        super().__init__()
+        self.network: Module = network
+        self.data_transformation: TorchTransformation = data_transformation
+        self.pred_fields: Optional[List[str]] = None
+
+    def forward(self,
+                input_data: Tensor) -> Tuple[Tensor, ...]:
+        """
+        Compute the prediction as done by the NetworkManager for an online prediction.
+
+        :param input_data: Input tensor.
+        :return: Prediction fields.
+        """
+
+        data_net = self.data_transformation.transform_before_prediction({'input': input_data})
+        data_pred = {'prediction': self.network.forward(data_net['input'])}
+        data_pred, _ = self.data_transformation.transform_before_loss(data_pred)
+        data_pred = self.data_transformation.transform_before_apply(data_pred)
+        self.pred_fields = list(data_pred.keys())
+        return tuple(data_pred[field] for field in self.pred_fields)
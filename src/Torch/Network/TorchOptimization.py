@@ -1,9 +1,15 @@
-from typing import Dict, Any
-from torch import Tensor, reshape
+from typing import Dict, Any, Optional, List, Union
+from math import inf
+from inspect import signature
+from torch import Tensor, reshape, empty
+from torch.amp import GradScaler
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from torch.distributed.optim import ZeroRedundancyOptimizer
 from collections import namedtuple
 
 from DeepPhysX.Core.Network.BaseOptimization import BaseOptimization
 from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
+from DeepPhysX.Torch.Network.TorchDistributed import TorchDistributed
 
 
 class TorchOptimization(BaseOptimization):
@@ -18,6 +24,38 @@ class TorchOptimization(BaseOptimization):
 
         BaseOptimization.__init__(self, config)
 
+        # Gradient scaler for float16 mixed precision
+        self.scaler: Optional[GradScaler] = None
+
+        # Gradient accumulation
+        self.accumulation_steps: int = config.accumulation_steps
+        self.nb_accumulated_steps: int = 0
+        self.accumulated_loss: Optional[Tensor] = None
+
+        # Data-parallel training of the Network, set with the optimizer
+        self.distributed: Optional[TorchDistributed] = None
+        self.shard_optimizer: bool = config.shard_optimizer
+
+        # Optimizer arguments and learning rate scheduler, created with the optimizer
+        self.optimizer_kwargs: Dict[str, Any] = {} if config.optimizer_kwargs is None else config.optimizer_kwargs
+        self.scheduler_class: Any = config.scheduler
+        self.scheduler_kwargs: Dict[str, Any] = {} if config.scheduler_kwargs is None else config.scheduler_kwargs
+        self.scheduler: Any = None
+
+        # Optimized Network, notified when its parameters are updated
+        self.net: Optional[TorchNetwork] = None
+
+        # Loss values are buffered on the device and transferred to the host every loss_report_steps steps
+        self.loss_report_steps: int = config.loss_report_steps
+        self.loss_buffer: Optional[Tensor] = None
+        self.nb_buffered_losses: int = 0
+        self.reported_loss: float = 0.
+        self.nb_reports: int = 0
+        # Plateau schedulers are only stepped with newly reported loss values
+        self.nb_scheduler_reports: int = 0
+        self.loss_statistics: Dict[str, float] = {}
+        self.reset_loss_statistics()
+
     def set_loss(self) -> None:
         """
         Initialize the loss function.
@@ -45,12 +83,95 @@ class TorchOptimization(BaseOptimization):
                        data_opt: Dict[str, Tensor]) -> Dict[str, float]:
         """
         Apply a transformation on the loss value using the potential additional data.
+        With gradient accumulation, the loss of the training batches is reported once for each optimizer step as the
+        mean loss of the accumulated batches.
 
         :param data_opt: Additional data sent as dict to compute loss value.
         :return: Transformed loss value.
         """
 
-        return {'loss': self.loss_value.item()}
+        loss_value = self.loss_value.detach()
+        if self.accumulation_steps > 1 and self.loss_value.requires_grad:
+            self.accumulated_loss = loss_value if self.nb_accumulated_steps == 0 else \
+                self.accumulated_loss + loss_value
+            if self.nb_accumulated_steps + 1 < self.accumulation_steps:
+                return {'loss': self.reported_loss}
+            loss_value = self.accumulated_loss / self.accumulation_steps
+        return self.report_loss(loss_value)
+
+    def report_loss(self,
+                    loss_value: Tensor) -> Dict[str, float]:
+        """
+        Report a loss value. With deferred loss report, the returned value is the mean of the last loss values
+        transferred to the host.
+
+        :param loss_value: Loss value to report.
+        :return: Reported loss value.
+        """
+
+        if self.loss_report_steps == 1:
+            self.reported_loss = loss_value.item()
+            self.nb_reports += 1
+            self.update_loss_statistics([self.reported_loss])
+            return {'loss': self.reported_loss}
+
+        # Store the loss value on the device without synchronization
+        if self.loss_buffer is None or self.loss_buffer.device != loss_value.device:
+            self.flush_losses()
+            self.loss_buffer = empty(self.loss_report_steps, dtype=loss_value.dtype, device=loss_value.device)
+        self.loss_buffer[self.nb_buffered_losses] = loss_value
+        self.nb_buffered_losses += 1
+        if self.nb_buffered_losses == self.loss_report_steps:
+            self.flush_losses()
+        return {'loss': self.reported_loss}
+
+    def flush_losses(self) -> None:
+        """
+        Transfer the buffered loss values to the host and update the loss statistics.
+        """
+
+        if self.nb_buffered_losses > 0:
+            loss_values = self.loss_buffer[:self.nb_buffered_losses].tolist()
+            self.nb_buffered_losses = 0
+            self.reported_loss = sum(loss_values) / len(loss_values)
+            self.nb_reports += 1
+            self.update_loss_statistics(loss_values)
+
+    def update_loss_statistics(self,
+                               loss_values: List[float]) -> None:
+        """
+        Update the running loss statistics with new loss values.
+
+        :param loss_values: Loss values transferred to the host.
+        """
+
+        count = self.loss_statistics['count'] + len(loss_values)
+        self.loss_statistics['mean'] += (sum(loss_values) - len(loss_values) * self.loss_statistics['mean']) / count
+        self.loss_statistics['min'] = min(self.loss_statistics['min'], *loss_values)
+        self.loss_statistics['max'] = max(self.loss_statistics['max'], *loss_values)
+        self.loss_statistics['count'] = count
+
+    def get_loss_statistics(self,
+                            reset: bool = True) -> Dict[str, float]:
+        """
+        Get the mean, min and max loss values since the last reset (e.g. at each epoch end), buffered values included.
+
+        :param reset: If True, statistics are reset after being returned.
+        :return: Loss statistics.
+        """
+
+        self.flush_losses()
+        loss_statistics = self.loss_statistics.copy()
+        if reset:
+            self.reset_loss_statistics()
+        return loss_statistics
+
+    def reset_loss_statistics(self) -> None:
+        """
+        Reset the running loss statistics.
+        """
+
+        self.loss_statistics = {'mean': 0., 'min': inf, 'max': -inf, 'count': 0}
 
     def set_optimizer(self,
                       net: TorchNetwork) -> None:
@@ -61,17 +182,156 @@ class TorchOptimization(BaseOptimization):
         """
 
         if (self.optimizer_class is not None) and (self.lr is not None):
-            self.optimizer = self.optimizer_class(net.parameters(), self.lr)
+            self.optimizer = self.create_optimizer(self.get_parameter_groups(net))
+            if self.scheduler_class is not None:
+                self.scheduler = self.scheduler_class(self.optimizer, **self.scheduler_kwargs)
+            # Loss scaling is only required by float16 mixed precision, the scaler is a pass-through otherwise
+            self.scaler = GradScaler(device='cpu' if net.device is None else net.device.type,
+                                     enabled=getattr(net.config, 'mixed_precision', None) == 'float16')
+            self.optimizer.zero_grad()
+        self.distributed = getattr(net, 'distributed', None)
+        self.net = net if isinstance(net, TorchNetwork) else None
+        if self.net is not None:
+            self.net.flush_gradients = self.flush_gradients
+
+    def get_parameter_groups(self,
+                             net: TorchNetwork) -> Union[List[Tensor], List[Dict[str, Any]]]:
+        """
+        Get the parameters to optimize. With a weight decay, parameters with less than two dimensions (biases,
+        normalization and activation parameters) are gathered in a group without weight decay.
+
+        :param net: Network whose parameters will be optimized.
+        :return: List of parameters or list of parameter groups.
+        """
+
+        if self.optimizer_kwargs.get('weight_decay', 0) == 0:
+            return list(net.parameters())
+        return [{'params': [parameter for parameter in net.parameters() if parameter.dim() > 1]},
+                {'params': [parameter for parameter in net.parameters() if parameter.dim() <= 1], 'weight_decay': 0.}]
+
+    def create_optimizer(self,
+                         parameters: Union[List[Tensor], List[Dict[str, Any]]]) -> Any:
+        """
+        Create the optimizer with its additional arguments. Unless an implementation is required, the fused one is used
+        if the optimizer and the device support it, then the multi-tensor (foreach) one.
+
+        :param parameters: List of parameters or list of parameter groups.
+        :return: Optimizer.
+        """
+
+        implementations = []
+        if 'fused' not in self.optimizer_kwargs and 'foreach' not in self.optimizer_kwargs:
+            arguments = signature(self.optimizer_class).parameters
+            implementations = [{implementation: True} for implementation in ['fused', 'foreach']
+                               if implementation in arguments]
+        for implementation in implementations + [{}]:
+            kwargs = {**self.optimizer_kwargs, **implementation}
+            try:
+                if self.shard_optimizer:
+                    # Each process only keeps the optimizer state of its part of the parameters
+                    return ZeroRedundancyOptimizer(parameters, optimizer_class=self.optimizer_class, lr=self.lr,
+                                                   **kwargs)
+                return self.optimizer_class(parameters, self.lr, **kwargs)
+            except (RuntimeError, ValueError):
+                # Implementation not supported for the device or the data type of the parameters
+                if len(implementation) == 0:
+                    raise
+
+    def get_optimizer_state(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of the optimizer, e.g. to save it with the Network parameters. A sharded optimizer state is
+        gathered in the main process, so all the processes must call this method.
+
+        :return: State of the optimizer, None in the other processes with a sharded optimizer.
+        """
+
+        if isinstance(self.optimizer, ZeroRedundancyOptimizer):
+            self.optimizer.consolidate_state_dict(to=0)
+            return self.optimizer.state_dict() if self.distributed.is_main else None
+        return self.optimizer.state_dict()
+
+    def load_optimizer_state(self,
+                             state: Dict[str, Any]) -> None:
+        """
+        Load a state of the optimizer. With a sharded optimizer, all the processes must call this method with the
+        whole state returned by get_optimizer_state, each process only keeps the state of its part of the parameters.
+
+        :param state: State of the optimizer.
+        """
+
+        self.optimizer.load_state_dict(state)
 
     def optimize(self) -> None:
         """
-        Run an optimization step.
+        Run an optimization step. With gradient accumulation, the parameters are only updated once gradients of
+        accumulation_steps batches were computed.
+        """
+
+        self.backward(self.loss_value)
+        # Batches predicted by micro-batches are back-propagated in the Network once the prediction gradients are known
+        if self.net is not None:
+            self.net.backward_micro_batches()
+        self.nb_accumulated_steps += 1
+        if self.nb_accumulated_steps == self.accumulation_steps:
+            self.step()
+
+    def backward(self,
+                 loss_value: Tensor) -> None:
+        """
+        Compute the gradients of a loss value, scaled by the number of accumulated batches.
+
+        :param loss_value: Loss value to back-propagate.
+        """
+
+        # Mean losses of uneven shards are weighted by their size in a data-parallel training
+        if self.distributed is not None:
+            loss_value = loss_value * self.distributed.shard_weight
+        self.scaler.scale(loss_value / self.accumulation_steps).backward()
+
+    def step(self) -> None:
+        """
+        Update the Network parameters with the accumulated gradients, step the learning rate scheduler, then reset the
+        gradients. In a data-parallel training, gradients are averaged between processes first.
         """
 
+        if self.distributed is not None:
+            self.distributed.all_reduce_gradients(parameter for group in self.optimizer.param_groups
+                                                  for parameter in group['params'])
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.net is not None:
+            self.net.reset_stacked_parameters()
+        if self.scheduler is not None:
+            # Plateau scheduler requires a metric, it is stepped once with each reported loss to avoid a synchronization
+            if isinstance(self.scheduler, ReduceLROnPlateau):
+                if self.nb_reports != self.nb_scheduler_reports:
+                    self.scheduler.step(self.reported_loss)
+                    self.nb_scheduler_reports = self.nb_reports
+            else:
+                self.scheduler.step()
         self.optimizer.zero_grad()
-        self.loss_value.backward()
-        self.optimizer.step()
+        self.nb_accumulated_steps = 0
+
+    def flush_gradients(self) -> None:
+        """
+        Update the Network parameters with the gradients accumulated since the last optimizer step when less than
+        accumulation_steps batches were accumulated (e.g. at the end of an epoch). Gradients are rescaled to the
+        number of accumulated batches and their mean loss is reported.
+        """
+
+        if self.optimizer is None or self.nb_accumulated_steps == 0:
+            return
+        for group in self.optimizer.param_groups:
+            for parameter in group['params']:
+                if parameter.grad is not None:
+                    parameter.grad.mul_(self.accumulation_steps / self.nb_accumulated_steps)
+        if self.accumulated_loss is not None:
+            self.report_loss(self.accumulated_loss / self.nb_accumulated_steps)
+        self.step()
 
     def __str__(self) -> str:
 
-        return BaseOptimization.__str__(self)
+        description = BaseOptimization.__str__(self)
+        description += f"    Accumulation steps: {self.accumulation_steps}\n"
+        description += f"    Loss report steps: {self.loss_report_steps}\n"
+        return description
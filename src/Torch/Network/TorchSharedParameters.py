@@ -0,0 +1,181 @@
+from typing import Any, Dict, Optional
+from sys import version_info
+from json import dumps, loads
+from time import sleep, time
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker
+from threading import Lock
+from numpy import prod, frombuffer
+import torch
+from torch import Tensor, from_numpy
+
+
+class SharedSegment(SharedMemory):
+
+    def close(self) -> None:
+        """
+        Close the access to the shared memory segment. The mapping is kept while tensors are viewing it, it is then
+        released with the last of these tensors.
+        """
+
+        try:
+            SharedMemory.close(self)
+        except BufferError:
+            pass
+
+
+class TorchSharedParameters:
+
+    # Segment layout: ready flag (8 bytes), header size (8 bytes), JSON header, aligned tensor data
+    HEADER_OFFSET = 16
+    ALIGNMENT = 64
+
+    # The resource tracker registration is disabled while attaching, one thread at a time
+    REGISTER_LOCK = Lock()
+
+    def __init__(self,
+                 name: str):
+        """
+        TorchSharedParameters stores a set of parameters in a named shared memory segment so that several processes
+        on the same host use a single copy of the parameters. The segment is created by the first process that
+        publishes the parameters, then other processes attach to it. Shared tensors are writable views of the segment:
+        an in-place modification in a process is seen by all the attached processes.
+
+        :param name: Name of the shared memory segment.
+        """
+
+        self.name: str = name
+        self.shared_memory: Optional[SharedSegment] = None
+        self.is_owner: bool = False
+
+    def publish(self,
+                state_dict: Dict[str, Tensor],
+                source: Optional[Dict[str, Any]] = None) -> Dict[str, Tensor]:
+        """
+        Create the shared memory segment and copy the parameters in it.
+        Raise a FileExistsError if the segment was already created by another process.
+
+        :param state_dict: Set of parameters to share.
+        :param source: Description of the origin of the parameters (e.g. file path, size and modification time),
+                       compared by the processes attaching to the segment.
+        :return: Set of parameters as views of the shared memory segment.
+        """
+
+        # Compute the position of each tensor in the segment
+        header, offset = {'source': source, 'tensors': {}}, 0
+        for key, value in state_dict.items():
+            header['tensors'][key] = {'dtype': str(value.dtype).split('.')[-1],
+                                      'shape': list(value.shape),
+                                      'offset': offset}
+            offset += self.align(value.numel() * value.element_size())
+        encoded_header = dumps(header).encode()
+        data_offset = self.align(self.HEADER_OFFSET + len(encoded_header))
+
+        # Write the header and the parameters, then set the ready flag
+        self.shared_memory = SharedSegment(name=self.name, create=True, size=max(data_offset + offset, 1))
+        self.is_owner = True
+        buffer = self.shared_memory.buf
+        buffer[8:self.HEADER_OFFSET] = len(encoded_header).to_bytes(8, 'little')
+        buffer[self.HEADER_OFFSET:self.HEADER_OFFSET + len(encoded_header)] = encoded_header
+        shared_state_dict = self.views(header['tensors'], data_offset)
+        with torch.no_grad():
+            for key, value in state_dict.items():
+                shared_state_dict[key].copy_(value.detach().cpu())
+        buffer[0] = 1
+        return shared_state_dict
+
+    def attach(self,
+               source: Optional[Dict[str, Any]] = None,
+               timeout: float = 60.) -> Dict[str, Tensor]:
+        """
+        Attach to an existing shared memory segment, once the parameters are published.
+        Raise a FileNotFoundError if the segment does not exist, or a ValueError if the parameters were published from
+        another source.
+
+        :param source: Expected origin of the parameters. If None, the origin is not checked.
+        :param timeout: Maximum time to wait for the parameters to be published.
+        :return: Set of parameters as views of the shared memory segment.
+        """
+
+        if version_info >= (3, 13):
+            self.shared_memory = SharedSegment(name=self.name, track=False)
+        else:
+            # Attached segments must not be registered, the resource tracker would remove them when this process
+            # exits (unregistering afterwards is not an option, forked processes share the tracker of their parent)
+            with self.REGISTER_LOCK:
+                register = resource_tracker.register
+                resource_tracker.register = lambda *args: None
+                try:
+                    self.shared_memory = SharedSegment(name=self.name)
+                finally:
+                    resource_tracker.register = register
+
+        # Wait for the publisher to set the ready flag
+        buffer = self.shared_memory.buf
+        start = time()
+        while buffer[0] != 1:
+            if time() - start > timeout:
+                raise TimeoutError(f"[{self.__class__.__name__}] Parameters were not published in the shared memory "
+                                   f"segment '{self.name}' after {timeout}s.")
+            sleep(0.01)
+        header_size = int.from_bytes(buffer[8:self.HEADER_OFFSET], 'little')
+        header = loads(bytes(buffer[self.HEADER_OFFSET:self.HEADER_OFFSET + header_size]).decode())
+        if source is not None and header['source'] != source:
+            self.shared_memory.close()
+            self.shared_memory = None
+            raise ValueError(f"[{self.__class__.__name__}] Parameters of the shared memory segment '{self.name}' were "
+                             f"published from {header['source']}, get {source}.")
+        return self.views(header['tensors'], self.align(self.HEADER_OFFSET + header_size))
+
+    def views(self,
+              header: Dict[str, Dict],
+              data_offset: int) -> Dict[str, Tensor]:
+        """
+        Create the tensors viewing the shared memory segment.
+
+        :param header: Data type, shape and offset of each tensor.
+        :param data_offset: Position of the tensor data in the segment.
+        :return: Set of parameters as views of the shared memory segment.
+        """
+
+        state_dict = {}
+        for key, value in header.items():
+            dtype = getattr(torch, value['dtype'])
+            count = int(prod(value['shape']))
+            if count == 0:
+                state_dict[key] = torch.empty(value['shape'], dtype=dtype)
+                continue
+            # Arrays keep a reference on the segment buffer, so that views stay valid as long as tensors exist
+            array = frombuffer(self.shared_memory.buf, dtype=str(dtype).split('.')[-1], count=count,
+                               offset=data_offset + value['offset'])
+            state_dict[key] = from_numpy(array).view(value['shape'])
+        return state_dict
+
+    def align(self,
+              size: int) -> int:
+        """
+        Round a size up to the alignment of the tensors in the segment.
+
+        :param size: Size in bytes.
+        :return: Aligned size in bytes.
+        """
+
+        return (size + self.ALIGNMENT - 1) // self.ALIGNMENT * self.ALIGNMENT
+
+    def unlink(self) -> None:
+        """
+        Remove the shared memory segment name. Processes already attached keep their views.
+        """
+
+        if self.shared_memory is not None and self.is_owner:
+            self.shared_memory.unlink()
+            self.is_owner = False
+
+    def __str__(self) -> str:
+
+        description = "\n"
+        description += f"  {self.__class__.__name__}\n"
+        description += f"    Name: {self.name}\n"
+        description += f"    Owner: {self.is_owner}\n"
+        description += f"    Size: {self.shared_memory.size if self.shared_memory is not None else 0}\n"
+        return description
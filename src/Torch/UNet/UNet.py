@@ -1,8 +1,13 @@
-from typing import List, Tuple, Union
-from torch import Tensor, zeros_like
+from typing import List, Tuple, Union, Optional, Mapping, Any, Dict, Iterator
+from contextlib import contextmanager, nullcontext
+from torch import Tensor, no_grad, is_grad_enabled, channels_last, channels_last_3d, memory_format
+from torch.utils.checkpoint import checkpoint
 from torch.nn import Module, Conv2d, Conv3d, BatchNorm2d, BatchNorm3d, ReLU, Sequential, MaxPool2d, MaxPool3d, \
     ConvTranspose2d, ConvTranspose3d
-from collections import namedtuple
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from torch.ao.quantization import QConfig, QuantStub, DeQuantStub, fuse_modules, get_default_qconfig, prepare, convert
+from torch.backends import quantized
+from collections import namedtuple, OrderedDict
 
 from DeepPhysX.Torch.Network.TorchNetwork import TorchNetwork
 from DeepPhysX.Torch.EncoderDecoder.EncoderDecoder import EncoderDecoder
@@ -52,6 +57,9 @@ class UNetLayer(Module):
         # Set the UNet layer
         self.unet_layer = Sequential(*layers)
 
+        # Recompute activations in backward instead of storing them
+        self.checkpoint: bool = False
+
     def forward(self,
                 input_data: Tensor) -> Tensor:
         """
@@ -61,8 +69,58 @@ class UNetLayer(Module):
         :return: Forward pass result.
         """
 
+        if self.checkpoint and self.training and is_grad_enabled():
+            return checkpoint(self.unet_layer, input_data, use_reentrant=False,
+                              context_fn=lambda: (nullcontext(), self.keep_running_stats()))
         return self.unet_layer(input_data)
 
+    @contextmanager
+    def keep_running_stats(self) -> Iterator[None]:
+        """
+        Restore the normalization running statistics after the recomputation of the layer in backward, so that they
+        are only updated by the forward pass.
+        """
+
+        buffers = [buffer for buffer in self.unet_layer.buffers()]
+        saved_buffers = [buffer.clone() for buffer in buffers]
+        try:
+            yield
+        finally:
+            for buffer, saved_buffer in zip(buffers, saved_buffers):
+                buffer.copy_(saved_buffer)
+
+    def fuse(self) -> None:
+        """
+        Fold the normalization statistics in the convolution weights and apply the activation in place.
+        The layer must be in eval mode.
+        """
+
+        layers = list(self.unet_layer)
+        fused_layers = []
+        for convolution, normalization, _ in zip(layers[0::3], layers[1::3], layers[2::3]):
+            fused_layers += [fuse_conv_bn_eval(convolution, normalization), ReLU(inplace=True)]
+        self.unet_layer = Sequential(*fused_layers)
+
+    def prepare_quantization(self,
+                             qconfig: QConfig) -> None:
+        """
+        Fuse each sequence of convolution, normalization and activation, then surround the layer with quantization
+        stubs so that the layer receives and returns float tensors. The layer must be in eval mode.
+
+        :param qconfig: Quantization configuration of the layer.
+        """
+
+        layers = list(self.unet_layer)
+        groups = []
+        for i, layer in enumerate(layers):
+            if isinstance(layer, (Conv2d, Conv3d)):
+                groups.append([str(i)])
+            elif len(groups) > 0 and isinstance(layer, (BatchNorm2d, BatchNorm3d, ReLU)):
+                groups[-1].append(str(i))
+        fused_layer = fuse_modules(self.unet_layer, groups)
+        self.unet_layer = Sequential(QuantStub(), *fused_layer, DeQuantStub())
+        self.qconfig = qconfig
+
 
 class UNet(TorchNetwork):
 
@@ -96,12 +154,14 @@ class UNet(TorchNetwork):
                                           for i in range(config.nb_steps)]]
 
         # Define up layers: sequence of (UpConvolutionLayer, UNetLayer)
+        # Without merge, UNetLayers only receive the up-sampled channels
+        merge_factor: int = 1 if config.skip_merge else 2
         up_layers: List[Union[ConvTranspose2d, ConvTranspose3d, UNetLayer]] = [
             *[Sequential(up_convolution_layer(in_channels=channels * 2 ** (i + 1),
                                               out_channels=channels * 2 ** i,
                                               kernel_size=up_kernel_size,
                                               stride=up_kernel_size),
-                         UNetLayer(channels * 2 ** (i + 1), channels * 2 ** i, config))
+                         UNetLayer(channels * 2 ** i * merge_factor, channels * 2 ** i, config))
               for i in range(config.nb_steps - 1, -1, -1)]]
 
         # Set encoder - decoder architecture
@@ -115,6 +175,19 @@ class UNet(TorchNetwork):
         self.finalLayer: Union[Conv2d, Conv3d] = last_convolution_layer(in_channels=channels,
                                                                         out_channels=config.nb_output_channels,
                                                                         kernel_size=final_kernel_size)
+        self.fused: bool = False
+
+        # Set gradient checkpointing for each level (the first level has the full resolution)
+        for level, unet_layer in enumerate(self.down):
+            unet_layer.checkpoint = config.gradient_checkpointing[level]
+        for level, (_, unet_layer) in zip(range(config.nb_steps - 1, -1, -1), self.up):
+            unet_layer.checkpoint = config.gradient_checkpointing[level]
+
+        # Use channels last memory format for convolutions
+        self.memory_format: Optional[memory_format] = None
+        if config.channels_last:
+            self.memory_format = channels_last if config.nb_dims == 2 else channels_last_3d
+            self.to(memory_format=self.memory_format)
 
     def forward(self,
                 input_data: Tensor) -> Tensor:
@@ -125,19 +198,137 @@ class UNet(TorchNetwork):
         :return: Network prediction.
         """
 
-        # Process down layers. Keep the outputs at each 'down' step to merge at same 'up' level.
-        down_outputs = [self.down[0](input_data)]
-        for unet_layer in self.down[1:]:
-            down_outputs.append(unet_layer(self.max_pool(down_outputs[-1])))
+        # Without merge, only the last output of each part is needed
+        if self.skip_merge:
+            x = self.down[0](input_data)
+            for unet_layer in self.down[1:]:
+                x = unet_layer(self.max_pool(x))
+            for up_conv_layer, unet_layer in self.up:
+                x = unet_layer(up_conv_layer(x))
 
-        # Process up layers. Merge same level 'down' outputs.
-        x = down_outputs.pop()
-        for (up_conv_layer, unet_layer), down_output in zip(self.up, down_outputs[::-1]):
-            same_level_down_output = zeros_like(down_output) if self.skip_merge else down_output
-            x = unet_layer(crop_and_merge(same_level_down_output, up_conv_layer(x)))
+        else:
+            # Process down layers. Keep the outputs at each 'down' step to merge at same 'up' level.
+            down_outputs = [self.down[0](input_data)]
+            for unet_layer in self.down[1:]:
+                down_outputs.append(unet_layer(self.max_pool(down_outputs[-1])))
 
+            # Process up layers. Merge same level 'down' outputs.
+            x = down_outputs.pop()
+            for (up_conv_layer, unet_layer), down_output in zip(self.up, down_outputs[::-1]):
+                x = unet_layer(crop_and_merge(down_output, up_conv_layer(x)))
+
+        # Weights of the final 1x1 convolution have an ambiguous layout, keep the output in channels last format
+        if self.memory_format is not None:
+            return self.finalLayer(x).contiguous(memory_format=self.memory_format)
         return self.finalLayer(x)
 
+    def load_state_dict(self,
+                        state_dict: Mapping[str, Any],
+                        strict: bool = True,
+                        assign: bool = False) -> Any:
+        """
+        Copy parameters and buffers from state_dict into the Network. Parameters saved with the former skip_merge
+        architecture (UNetLayers receiving zeros in place of the 'down' outputs) are converted.
+
+        :param state_dict: Parameters and buffers to load.
+        :param strict: Whether the keys of state_dict must exactly match the keys of the Network.
+        :param assign: Whether to assign the tensors of state_dict instead of copying them.
+        :return: Missing and unexpected keys.
+        """
+
+        if self.skip_merge:
+            state_dict = self.convert_skip_merge_state_dict(state_dict)
+        return TorchNetwork.load_state_dict(self, state_dict, strict=strict, assign=assign)
+
+    def convert_skip_merge_state_dict(self,
+                                      state_dict: Mapping[str, Any]) -> Mapping[str, Any]:
+        """
+        Remove the input channels of the first convolution of each up UNetLayer that were applied to zeros.
+
+        :param state_dict: Parameters saved with the former skip_merge architecture.
+        :return: Parameters matching the current skip_merge architecture.
+        """
+
+        metadata = getattr(state_dict, '_metadata', None)
+        state_dict = OrderedDict(state_dict)
+        if metadata is not None:
+            state_dict._metadata = metadata
+        for i, (_, unet_layer) in enumerate(self.up):
+            key = f'up.{i}.1.unet_layer.0.weight'
+            nb_channels = unet_layer.unet_layer[0].in_channels
+            if key in state_dict and state_dict[key].shape[1] == 2 * nb_channels:
+                # Merged tensors are ('down' output, up-sampled output): zeros were in the first half
+                state_dict[key] = state_dict[key][:, nb_channels:]
+        return state_dict
+
+    def fuse(self,
+             sample: Optional[Tensor] = None,
+             tolerance: float = 1e-4) -> float:
+        """
+        Fold the normalization layers of each UNetLayer in their convolutions for deployment. The Network is set in eval
+        mode, the parameters must be loaded before since the fused layers no longer match the saved parameters.
+
+        :param sample: Input tensor used to check the numerical equivalence between fused and unfused Networks.
+        :param tolerance: Maximal absolute difference allowed between fused and unfused predictions.
+        :return: Maximal absolute difference between fused and unfused predictions on the sample.
+        """
+
+        if self.fused:
+            return 0.
+        self.set_eval()
+        unet_layers = [*self.down, *[unet_layer for _, unet_layer in self.up]]
+        unfused_layers = [unet_layer.unet_layer for unet_layer in unet_layers]
+
+        # Fused weights must not be inference tensors, the fused Network can still be trained
+        with no_grad():
+            reference = None if sample is None else self.forward(sample)
+            for unet_layer in unet_layers:
+                unet_layer.fuse()
+            error = 0. if sample is None else (self.forward(sample) - reference).abs().max().item()
+
+        # Restore the unfused layers if predictions differ
+        if error > tolerance:
+            for unet_layer, unfused_layer in zip(unet_layers, unfused_layers):
+                unet_layer.unet_layer = unfused_layer
+            raise ValueError(f"[{self.__class__.__name__}] Fused predictions differ from the unfused ones: maximal "
+                             f"difference is {error}, tolerance is {tolerance}.")
+        self.fused = True
+        self.compiled_forwards.clear()
+        return error
+
+    def quantize(self,
+                 samples: Optional[List[Tensor]] = None) -> Dict[str, float]:
+        """
+        Apply a post-training static int8 quantization on the UNetLayers: convolutions are fused with their
+        normalization and activation, then activation ranges are calibrated on the samples. Up-sampling and final
+        convolutions, pooling and merges remain in float. The parameters must be loaded before since the quantized
+        Network no longer matches the saved parameters. Quantized predictions run on CPU only.
+
+        :param samples: Input tensors used to calibrate the activation ranges and to measure the drift of the quantized
+                        predictions.
+        :return: Maximal, mean and relative prediction errors of the quantized Network on the samples.
+        """
+
+        if samples is None or len(samples) == 0:
+            raise ValueError(f"[{self.__class__.__name__}] Static quantization requires samples for calibration.")
+        references = self.prepare_quantization(samples)
+
+        # Select the quantization engine available on this computer
+        engine = [engine for engine in ['x86', 'fbgemm', 'qnnpack'] if engine in quantized.supported_engines][0]
+        quantized.engine = engine
+
+        # Prepare the UNetLayers, calibrate the activation ranges, then convert
+        for unet_layer in [*self.down, *[unet_layer for _, unet_layer in self.up]]:
+            unet_layer.prepare_quantization(get_default_qconfig(engine))
+        prepare(self, inplace=True)
+        with no_grad():
+            for sample in samples:
+                self.forward(sample)
+        convert(self, inplace=True)
+        self.quantization = 'static'
+        self.fused = True
+        return self.quantization_drift(samples, references)
+
     def __str__(self) -> str:
 
         description = TorchNetwork.__str__(self)
@@ -149,6 +340,9 @@ class UNet(TorchNetwork):
         description += f"    Two sublayers in a step: {self.config.two_sublayers}\n"
         description += f"    Border mode: {self.config.border_mode}\n"
         description += f"    Merge on same level: {not self.config.skip_merge}\n"
+        description += f"    Gradient checkpointing: {self.config.gradient_checkpointing}\n"
+        description += f"    Fused layers: {self.fused}\n"
+        description += f"    Channels last: {self.config.channels_last}\n"
         description += f"    Down layers: {self.print_architecture(str(self.down))}\n"
         description += f"    Up layers: {self.print_architecture(str(self.up))}\n"
         description += f"    Final layer: {self.print_architecture(str(self.finalLayer))}"
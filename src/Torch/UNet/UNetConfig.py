@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Type
+from typing import Any, Dict, List, Optional, Type, Union
 
 from DeepPhysX.Core.Utils.configs import make_config
 from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig
@@ -29,7 +29,29 @@ class UNetConfig(TorchNetworkConfig):
                  two_sublayers: bool = True,
                  border_mode: str = 'valid',
                  skip_merge: bool = False,
-                 data_scale: float = 1.):
+                 data_scale: float = 1.,
+                 channels_last: bool = False,
+                 grid_sizes: Optional[List[List[int]]] = None,
+                 gradient_checkpointing: Union[List[bool], bool] = False,
+                 mixed_precision: Optional[str] = None,
+                 buffer_pool: bool = False,
+                 compile_inference: Optional[str] = None,
+                 accumulation_steps: int = 1,
+                 micro_batch_size: Optional[int] = None,
+                 loss_report_steps: int = 1,
+                 async_save: bool = False,
+                 max_pending_saves: int = 1,
+                 keep_last_checkpoints: Optional[int] = None,
+                 checkpoint_format: str = 'pth',
+                 shared_memory_name: Optional[str] = None,
+                 cpu_threads: Optional[Union[int, str]] = None,
+                 cpu_interop_threads: Optional[int] = None,
+                 cpu_affinity: Optional[List[int]] = None,
+                 distributed: Optional[str] = None,
+                 shard_optimizer: bool = False,
+                 optimizer_kwargs: Optional[Dict[str, Any]] = None,
+                 scheduler: Any = None,
+                 scheduler_kwargs: Optional[Dict[str, Any]] = None):
         """
         UNetConfig is a configuration class to parameterize and create UNet, TorchOptimization and UNetTransformation
         for the NetworkManager.
@@ -54,8 +76,38 @@ class UNetConfig(TorchNetworkConfig):
         :param nb_steps: Number of steps of down layers / up layers.
         :param two_sublayers: Duplicate each layer or not.
         :param border_mode: Zero-padding mode.
-        :param skip_merge: Skip the crop step at each up layer or not.
+        :param skip_merge: If True, up layers do not merge the same level 'down' outputs.
         :param data_scale: Scale to apply to data.
+        :param channels_last: If True, UNet runs in channels last memory format, so that data reshaped by the
+                              UNetTransformation is used without any transposition copy.
+        :param grid_sizes: Other expected grid sizes (in the same order as the input size) for which the padding is
+                           computed in advance. Grids of any size can be given as inputs shaped (N, Z, Y, X, C).
+        :param gradient_checkpointing: If True, activations of UNet layers are recomputed in backward instead of being
+                                       stored during training. This value can either be given as a bool for all levels
+                                       or as a list of nb_steps + 1 values to detail each level (from the full
+                                       resolution to the deepest level). Normalization running statistics are only
+                                       updated by the forward pass.
+        :param mixed_precision: If specified, forward passes run under autocast with this reduced precision type
+                                (either 'float16' or 'bfloat16').
+        :param buffer_pool: If True, arrays are converted to tensors through persistent buffers.
+        :param compile_inference: If specified, forward passes in eval mode are compiled for each input shape, either
+                                  with a frozen TorchScript trace ('trace') or with torch.compile ('compile').
+        :param accumulation_steps: Number of batches over which gradients are accumulated before each optimizer step.
+        :param micro_batch_size: Maximal number of samples in a forward pass of a training batch.
+        :param loss_report_steps: Number of steps for which loss values are kept on the device before being reported.
+        :param async_save: If True, parameters are written from a background thread.
+        :param max_pending_saves: Maximum number of saves in progress with async_save.
+        :param keep_last_checkpoints: If set, only the last saved sets of parameters are kept.
+        :param checkpoint_format: File format of the saved parameters, either 'pth' or 'safetensors'.
+        :param shared_memory_name: If set, parameters loaded for prediction are shared between processes.
+        :param cpu_threads: Number of threads for CPU computations, None for the default policy or 'auto'.
+        :param cpu_interop_threads: Number of inter-op threads for CPU computations.
+        :param cpu_affinity: List of CPUs on which the process is pinned.
+        :param distributed: If specified, backend of the data-parallel training on several processes.
+        :param shard_optimizer: If True, the optimizer state is sharded between the data-parallel processes.
+        :param optimizer_kwargs: Additional arguments of the optimizer.
+        :param scheduler: Learning rate scheduler class.
+        :param scheduler_kwargs: Arguments of the learning rate scheduler.
         """
 
         TorchNetworkConfig.__init__(self,
@@ -71,7 +123,26 @@ class UNetConfig(TorchNetworkConfig):
                                     lr=lr,
                                     require_training_stuff=require_training_stuff,
                                     loss=loss,
-                                    optimizer=optimizer)
+                                    optimizer=optimizer,
+                                    mixed_precision=mixed_precision,
+                                    buffer_pool=buffer_pool,
+                                    compile_inference=compile_inference,
+                                    accumulation_steps=accumulation_steps,
+                                    micro_batch_size=micro_batch_size,
+                                    loss_report_steps=loss_report_steps,
+                                    async_save=async_save,
+                                    max_pending_saves=max_pending_saves,
+                                    keep_last_checkpoints=keep_last_checkpoints,
+                                    checkpoint_format=checkpoint_format,
+                                    shared_memory_name=shared_memory_name,
+                                    cpu_threads=cpu_threads,
+                                    cpu_interop_threads=cpu_interop_threads,
+                                    cpu_affinity=cpu_affinity,
+                                    distributed=distributed,
+                                    shard_optimizer=shard_optimizer,
+                                    optimizer_kwargs=optimizer_kwargs,
+                                    scheduler=scheduler,
+                                    scheduler_kwargs=scheduler_kwargs)
 
         name = self.__class__.__name__
         # Check the input size type
@@ -92,7 +163,8 @@ class UNetConfig(TorchNetworkConfig):
             if nb_channel < 1:
                 raise ValueError(f"[{name}] '{arg_name} must be positive")
         # Check the boolean values
-        for flag, flag_name in zip([two_sublayers, skip_merge], ['two_sublayers', 'skip_merge']):
+        for flag, flag_name in zip([two_sublayers, skip_merge, channels_last],
+                                   ['two_sublayers', 'skip_merge', 'channels_last']):
             if type(flag) != bool:
                 raise TypeError(f"[{name}] Wrong '{flag_name}' type: bool required, get {type(flag)}")
         # Check border mode type and value
@@ -100,6 +172,26 @@ class UNetConfig(TorchNetworkConfig):
             raise TypeError(f"[{name}] Wrong 'border_mode' type: str required, get {type(border_mode)}")
         if border_mode not in ['valid', 'same']:
             raise ValueError(f"[{name}] 'border_mode' must be in ['valid', 'same'], get {border_mode}")
+        # Check gradient checkpointing type and value
+        if isinstance(gradient_checkpointing, list):
+            if len(gradient_checkpointing) != nb_steps + 1:
+                raise ValueError(f"[{name}] 'gradient_checkpointing' list length must be nb_steps + 1 = {nb_steps + 1}, "
+                                 f"get {len(gradient_checkpointing)}")
+            if any(type(level_checkpointing) != bool for level_checkpointing in gradient_checkpointing):
+                raise TypeError(f"[{name}] Wrong 'gradient_checkpointing' values type: bool required for each level")
+        elif type(gradient_checkpointing) == bool:
+            gradient_checkpointing = [gradient_checkpointing] * (nb_steps + 1)
+        else:
+            raise TypeError(f"[{name}] Wrong 'gradient_checkpointing' type: bool or list required, get "
+                            f"{type(gradient_checkpointing)}")
+        # Check grid sizes type and values
+        grid_sizes = grid_sizes if grid_sizes else []
+        if type(grid_sizes) not in [list, tuple]:
+            raise TypeError(f"[{name}] Wrong 'grid_sizes' type: list or tuple required, get {type(grid_sizes)}")
+        for grid_size in grid_sizes:
+            if type(grid_size) not in [list, tuple] or len(grid_size) != 3 or \
+                    any(type(size) != int or size < 1 for size in grid_size):
+                raise ValueError(f"[{name}] Each grid size must contain 3 positive int, get {grid_size}")
         # Check data scale type and value
         if type(data_scale) != float:
             raise TypeError(f"[{name}] Wrong 'data_scale' type: float required, get {type(data_scale)}")
@@ -117,7 +209,9 @@ class UNetConfig(TorchNetworkConfig):
                                           nb_steps=nb_steps,
                                           two_sublayers=two_sublayers,
                                           border_mode=border_mode,
-                                          skip_merge=skip_merge)
+                                          skip_merge=skip_merge,
+                                          channels_last=channels_last,
+                                          gradient_checkpointing=gradient_checkpointing)
 
         # Define specific UNetDataTransformation config
         self.data_transformation_config = make_config(configuration_object=self,
@@ -128,4 +222,6 @@ class UNetConfig(TorchNetworkConfig):
                                                       nb_steps=nb_steps,
                                                       two_sublayers=two_sublayers,
                                                       border_mode=border_mode,
-                                                      data_scale=data_scale)
+                                                      data_scale=data_scale,
+                                                      channels_last=channels_last,
+                                                      grid_sizes=grid_sizes)
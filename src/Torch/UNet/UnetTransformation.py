@@ -1,11 +1,13 @@
 from typing import List, Optional, Tuple, Dict
 from torch.nn.functional import pad
-from torch import reshape, Tensor
+from torch import reshape, Tensor, channels_last_3d
 from numpy import asarray
 from collections import namedtuple
 
 from DeepPhysX.Torch.Network.TorchTransformation import TorchTransformation
 
+PaddingPlan = namedtuple('PaddingPlan', ['minimal_shape', 'pad_widths', 'inverse_pad_widths'])
+
 
 class UnetTransformation(TorchTransformation):
 
@@ -25,9 +27,14 @@ class UnetTransformation(TorchTransformation):
         self.nb_output_channels: int = self.config.nb_output_channels
         self.nb_input_channels: int = self.config.nb_input_channels
         self.data_scale: float = self.config.data_scale
+        self.channels_last: bool = self.config.channels_last
         self.pad_widths: Optional[List[int]] = None
         self.inverse_pad_widths: Optional[List[int]] = None
 
+        # Padding plans are cached for each grid shape, the last used one defines the current padding
+        self.padding_plans: Dict[Tuple[int, ...], PaddingPlan] = {}
+        self.grid_shape: Optional[Tuple[int, ...]] = None
+
         # Define shape transformations
         border = 4 if self.config.two_sublayers else 2
         border = 0 if self.config.border_mode == 'same' else border
@@ -35,6 +42,16 @@ class UnetTransformation(TorchTransformation):
         self.reverse_down_step = lambda x: (x + border) * 2
         self.reverse_up_step = lambda x: (x + border - 1) // 2 + 1
 
+        # Pre-compute the padding plans of the expected grid sizes
+        grid_sizes = self.config.grid_sizes if self.config.grid_sizes else []
+        if 0 not in self.input_size:
+            grid_sizes = [self.input_size] + grid_sizes
+        self.prepare_padding_plans(grid_sizes)
+
+        # The current grid is given by the input size until an input with another grid shape is seen
+        if 0 not in self.input_size:
+            self.compute_pad_widths((self.input_size[2], self.input_size[1], self.input_size[0]))
+
     @TorchTransformation.check_type
     def transform_before_prediction(self,
                                     data_net: Dict[str, Tensor]) -> Dict[str, Tensor]:
@@ -45,18 +62,22 @@ class UnetTransformation(TorchTransformation):
         :return: Transformed data_net.
         """
 
-        # Transform tensor shape
+        # Transform tensor shape, grid shape is given either by the input shape (N, Z, Y, X, C) or by the input size
         data_in = data_net['input']
-        data_in = data_in.view((-1, self.input_size[2], self.input_size[1], self.input_size[0], self.nb_input_channels))
+        if data_in.dim() != 5:
+            data_in = data_in.view((-1, self.input_size[2], self.input_size[1], self.input_size[0],
+                                    self.nb_input_channels))
         data_in = data_in.permute((0, 4, 1, 2, 3))
 
-        # Compute padding
-        if self.pad_widths is None:
-            transformed_shape = data_in[0].shape[1:]
-            self.compute_pad_widths(transformed_shape)
+        # Get the padding plan of the grid shape
+        self.compute_pad_widths(data_in.shape[2:])
 
         # Apply padding
         data_in = pad(data_in, self.pad_widths, mode='constant')
+
+        # The permuted view already has the channels last layout, padding preserves it
+        if self.channels_last:
+            data_in = data_in.contiguous(memory_format=channels_last_3d)
         return {'input': data_in}
 
     @TorchTransformation.check_type
@@ -76,14 +97,13 @@ class UnetTransformation(TorchTransformation):
 
         if data_opt is not None:
             data_gt = data_opt['ground_truth']
-            data_gt = reshape(data_gt,
-                              (-1, self.input_size[2], self.input_size[1], self.input_size[0], self.nb_output_channels))
+            data_gt = reshape(data_gt, (-1, *self.grid_shape, self.nb_output_channels))
             data_gt = self.data_scale * data_gt
             data_opt['ground_truth'] = data_gt
 
 
         # Transform prediction
-        # Apply inverse padding, permute
+        # Apply inverse padding, permute (a contiguous view with channels last)
         data_out = data_pred['prediction']
         data_out = pad(data_out, self.inverse_pad_widths)
         data_out = data_out.permute(0, 2, 3, 4, 1)
@@ -109,8 +129,23 @@ class UnetTransformation(TorchTransformation):
                            desired_shape: List[int]) -> None:
         """
         Define padding to apply on data given the data shape and the network architecture.
+        The padding plan is computed at the first sight of the shape, then reused.
+
+        :param desired_shape: Data shape without padding.
+        """
+
+        self.grid_shape = tuple(int(d) for d in desired_shape)
+        if self.grid_shape not in self.padding_plans:
+            self.padding_plans[self.grid_shape] = self.compute_padding_plan(self.grid_shape)
+        _, self.pad_widths, self.inverse_pad_widths = self.padding_plans[self.grid_shape]
+
+    def compute_padding_plan(self,
+                             desired_shape: Tuple[int, ...]) -> PaddingPlan:
+        """
+        Compute the minimal shape accepted by the network architecture and the padding widths for a data shape.
 
         :param desired_shape: Data shape without padding.
+        :return: Minimal shape, padding widths and inverse padding widths.
         """
 
         # Compute minimal input shape given the desired shape
@@ -119,15 +154,29 @@ class UnetTransformation(TorchTransformation):
             minimal_shape = self.reverse_up_step(minimal_shape)
         for i in range(self.nb_steps):
             minimal_shape = self.reverse_down_step(minimal_shape)
-        minimal_shape = tuple(self.reverse_first_step(minimal_shape))
+        minimal_shape = tuple(int(m) for m in self.reverse_first_step(minimal_shape))
 
         # Compute padding width between shapes
         pad_widths = [((m - d) // 2, (m - d - 1) // 2 + 1) for m, d in zip(minimal_shape, desired_shape)]
         pad_widths.reverse()    # PyTorch applies padding from last dimension
-        self.pad_widths, self.inverse_pad_widths = (), ()
+        padding, inverse_padding = (), ()
         for p in pad_widths:
-            self.pad_widths += p
-            self.inverse_pad_widths += (-p[0], -p[1])   # PyTorch accepts negative padding
+            padding += p
+            inverse_padding += (-p[0], -p[1])   # PyTorch accepts negative padding
+        return PaddingPlan(minimal_shape, padding, inverse_padding)
+
+    def prepare_padding_plans(self,
+                              grid_sizes: List[List[int]]) -> None:
+        """
+        Pre-compute the padding plans of a list of expected grid sizes.
+
+        :param grid_sizes: List of grid sizes, given in the same order as the input size (X, Y, Z).
+        """
+
+        for grid_size in grid_sizes:
+            desired_shape = (grid_size[2], grid_size[1], grid_size[0])
+            if desired_shape not in self.padding_plans:
+                self.padding_plans[desired_shape] = self.compute_padding_plan(desired_shape)
 
     def __str__(self):
 
@@ -135,6 +184,8 @@ class UnetTransformation(TorchTransformation):
         description += f"  {self.name}\n"
         description += f"    Data type: {self.data_type}\n"
         description += f"    Data scale: {self.data_scale}\n"
+        description += f"    Channels last: {self.channels_last}\n"
+        description += f"    Padding plans: {list(self.padding_plans.keys())}\n"
         description += f"    Transformation before prediction: Input -> Reshape + Permute + Padding\n"
         description += f"    Transformation before loss: Ground Truth -> Reshape + Upscale\n"
         description += f"                                Prediction -> Inverse padding + Permute\n"
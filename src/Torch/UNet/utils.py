@@ -12,4 +12,4 @@ def crop_and_merge(tensor1: torch.Tensor, tensor2: torch.Tensor) -> torch.Tensor
     slices = crop_slices(tensor1.size(), tensor2.size())
     slices[0] = slice(None)
     slices[1] = slice(None)
-    return cat((tensor1[slices], tensor2), 1)
+    return cat((tensor1[tuple(slices)], tensor2), 1)
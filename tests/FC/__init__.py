@@ -1,2 +1,3 @@
 from .tests_FC import TestFC
 from .tests_FCConfig import TestFCConfig
+from .tests_FCEnsemble import TestFCEnsemble
@@ -4,6 +4,7 @@ from sys import stdout
 
 from tests_FC import TestFC
 from tests_FCConfig import TestFCConfig
+from tests_FCEnsemble import TestFCEnsemble
 
 
 if __name__ == '__main__':
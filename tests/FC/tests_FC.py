@@ -1,7 +1,15 @@
-from unittest import TestCase
-from torch import rand
+from unittest import TestCase, skipIf
+from os.path import join
+from tempfile import TemporaryDirectory
+from importlib.util import find_spec
+from torch import rand, float32, equal
+from torch.nn import MSELoss, Linear
+from torch.optim import Adam
+from numpy.random import random
 
 from DeepPhysX.Torch.FC.FCConfig import FCConfig, FC
+from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig
+from DeepPhysX.Torch.Network.TorchOnnxNetwork import TorchOnnxNetwork
 
 
 class TestFC(TestCase):
@@ -23,3 +31,124 @@ class TestFC(TestCase):
         data = rand((1, 5, 2))
         self.assertEqual(self.fc.forward(data).shape, (1, 5, 2))
 
+    def test_mixed_precision(self):
+        # Wrong precision type
+        with self.assertRaises(ValueError):
+            FCConfig(dim_layers=[10, 10, 10], dim_output=2, mixed_precision='float8')
+        # Prediction is cast back to the data type, optimization runs through the scaler
+        config = FCConfig(dim_layers=[10, 10, 10], dim_output=2, mixed_precision='bfloat16', lr=1e-3,
+                          loss=MSELoss, optimizer=Adam)
+        fc = config.create_network()
+        optimization = config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        data = rand((1, 5, 2))
+        prediction = fc.predict({'input': data})
+        self.assertEqual(prediction['prediction'].dtype, float32)
+        optimization.compute_loss(prediction, {'ground_truth': rand((1, 5, 2))})
+        optimization.optimize()
+
+    def test_compiled_inference(self):
+        # Compiled forward pass is cached per input shape and matches the eager forward pass
+        fc = FCConfig(dim_layers=[10, 10, 10], dim_output=2, compile_inference='trace').create_network()
+        fc.set_eval()
+        data = rand((1, 5, 2))
+        self.assertTrue(bool((fc.predict({'input': data})['prediction'] - fc.forward(data)).abs().max() < 1e-6))
+        self.assertEqual(len(fc.compiled_forwards), 1)
+        fc.predict({'input': rand((3, 5, 2))})
+        self.assertEqual(len(fc.compiled_forwards), 2)
+        # Cache is cleared with the eval mode
+        fc.set_eval()
+        self.assertEqual(len(fc.compiled_forwards), 0)
+
+    def test_inference_mode(self):
+        # Inputs do not require gradient and predictions are not recorded in eval mode
+        self.fc.set_eval()
+        data = self.fc.numpy_to_tensor(random((1, 5, 2)))
+        self.assertFalse(data.requires_grad)
+        self.assertTrue(self.fc.predict({'input': data})['prediction'].is_inference())
+        # Inputs require gradient in train mode
+        self.fc.set_train()
+        data = self.fc.numpy_to_tensor(random((1, 5, 2)))
+        self.assertTrue(data.requires_grad)
+        self.assertTrue(self.fc.predict({'input': data})['prediction'].requires_grad)
+
+    def test_fused_inference(self):
+        # Fused forward pass matches the sequence of layers for any batch size
+        config = FCConfig(dim_layers=[10, 20, 15, 10], dim_output=2, biases=[True, False, True], fused_inference=True)
+        fc = config.create_network()
+        fc.set_eval()
+        for nb_samples in [4, 1, 8]:
+            data = rand((nb_samples, 5, 2))
+            prediction = fc.predict({'input': data})['prediction']
+            expected = fc.linear(data.view(nb_samples, -1)).view(nb_samples, 5, 2)
+            self.assertLess((prediction - expected).abs().max(), 1e-5)
+        self.assertEqual(fc.fused_workspaces[0].numel(), 8 * 20)
+        # Stacked parameters are updated when parameters are loaded
+        with TemporaryDirectory() as directory:
+            config.create_network().save_parameters(join(directory, 'network'))
+            fc.load_parameters(join(directory, 'network.pth'))
+        self.assertFalse(equal(fc.predict({'input': data})['prediction'], prediction))
+        prediction, expected = fc.predict({'input': data})['prediction'], fc.linear(data.view(8, -1)).view(8, 5, 2)
+        self.assertLess((prediction - expected).abs().max(), 1e-5)
+        # Sequence of layers is used for training
+        fc.set_train()
+        self.assertTrue(fc.predict({'input': data})['prediction'].requires_grad)
+        # Stacked parameters are updated after an optimizer step
+        optimization = FCConfig(dim_layers=[10, 20, 15, 10], dim_output=2, loss=MSELoss, optimizer=Adam,
+                                lr=1e-2).create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        optimization.compute_loss(fc.predict({'input': data}), {'ground_truth': rand((8, 5, 2))})
+        optimization.optimize()
+        fc.eval()
+        prediction, expected = fc.predict({'input': data})['prediction'], fc.linear(data.view(8, -1)).view(8, 5, 2)
+        self.assertLess((prediction - expected).abs().max(), 1e-5)
+
+    def test_load_parameters(self):
+        # Memory-mapped parameters are copied in the existing parameters
+        with TemporaryDirectory() as directory:
+            self.fc.save_parameters(join(directory, 'network'))
+            fc = FCConfig(dim_layers=[10, 10, 10], dim_output=2).create_network()
+            parameter = fc.layers[0].weight
+            fc.load_parameters(join(directory, 'network.pth'))
+            self.assertIs(fc.layers[0].weight, parameter)
+            for key, value in self.fc.state_dict().items():
+                self.assertTrue(equal(fc.state_dict()[key], value))
+
+    @skipIf(find_spec('safetensors') is None, 'safetensors is not installed')
+    def test_load_safetensors(self):
+        # Parameters saved and loaded with the safetensors format
+        fc = FCConfig(dim_layers=[10, 10, 10], dim_output=2, checkpoint_format='safetensors').create_network()
+        with TemporaryDirectory() as directory:
+            fc.save_parameters(join(directory, 'network'))
+            self.fc.load_parameters(join(directory, 'network.safetensors'))
+        for key, value in fc.state_dict().items():
+            self.assertTrue(equal(self.fc.state_dict()[key], value))
+
+    def test_quantize(self):
+        # Linear layers are dynamically quantized, predictions remain close to the float ones
+        samples = [rand((4, 10)) for _ in range(3)]
+        with TemporaryDirectory() as directory:
+            self.fc.save_parameters(join(directory, 'network'))
+            fc, drift = FCConfig(dim_layers=[10, 10, 10],
+                                 dim_output=2).create_quantized_network(join(directory, 'network.pth'), samples)
+        self.assertEqual(fc.quantization, 'dynamic')
+        self.assertLess(drift['relative_error'], 5e-2)
+        self.assertNotIsInstance(fc.linear[0], Linear)
+        self.assertEqual(fc.predict({'input': samples[0]})['prediction'].shape, (4, 5, 2))
+
+    @skipIf(find_spec('onnx') is None or find_spec('onnxruntime') is None, 'onnx or onnxruntime is not installed')
+    def test_export_onnx(self):
+        # Exported graph gives the same predictions for any batch size
+        config = FCConfig(dim_layers=[10, 10, 10], dim_output=2)
+        with TemporaryDirectory() as directory:
+            path = self.fc.export_onnx(join(directory, 'network'), config.create_data_transformation(), rand((1, 10)))
+            onnx_network = TorchNetworkConfig(network_class=TorchOnnxNetwork).create_network()
+            onnx_network.set_device()
+            onnx_network.load_parameters(path)
+        data = random((4, 10))
+        prediction = onnx_network.predict({'input': onnx_network.numpy_to_tensor(data)})['prediction']
+        expected = self.fc.predict({'input': self.fc.numpy_to_tensor(data)})['prediction']
+        self.assertEqual(prediction.shape, (4, 5, 2))
+        self.assertLess(abs(prediction - expected.numpy()).max(), 1e-5)
@@ -23,3 +23,9 @@ class TestFCConfig(TestCase):
         self.assertEqual(fc_config.network_config.dim_output, 0)
         self.assertTrue('dim_layers' in fc_config.network_config._fields)
         self.assertEqual(fc_config.network_config.dim_layers, [])
+
+    def test_positional_arguments(self):
+        # FC parameters follow the base parameters
+        fc_config = FCConfig(None, None, None, 'FCNetwork', 0, False, 'float32', None, True, None, None, 2, [10, 10])
+        self.assertEqual(fc_config.network_config.dim_output, 2)
+        self.assertEqual(fc_config.network_config.dim_layers, [10, 10])
@@ -0,0 +1,63 @@
+from unittest import TestCase
+from os.path import join
+from tempfile import TemporaryDirectory
+from torch import rand, stack, float32
+from torch.nn import MSELoss
+from torch.optim import Adam
+
+from DeepPhysX.Torch.FC.FCEnsembleConfig import FCEnsembleConfig, FCEnsemble
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+
+
+class TestFCEnsemble(TestCase):
+
+    def setUp(self):
+        self.config = FCEnsembleConfig(dim_layers=[10, 20, 10], dim_output=2, nb_members=3, lr=1e-3, loss=MSELoss,
+                                       optimizer=Adam)
+        self.ensemble = self.config.create_network()
+
+    def test_init(self):
+        # Check config and model
+        with self.assertRaises(ValueError):
+            FCEnsembleConfig(dim_layers=[10, 20, 10], dim_output=2, nb_members=0)
+        self.assertIsInstance(self.ensemble, FCEnsemble)
+        self.assertEqual(len(self.ensemble.members), 3)
+        self.assertEqual(self.ensemble.pred_fields, ['prediction', 'variance'])
+
+    def test_load_members(self):
+        # Predictions are the mean and the variance of the FC networks predictions
+        networks = [FCConfig(dim_layers=[10, 20, 10], dim_output=2).create_network() for _ in range(3)]
+        with TemporaryDirectory() as directory:
+            paths = []
+            for i, network in enumerate(networks):
+                network.save_parameters(join(directory, f'network_{i}'))
+                paths.append(join(directory, f'network_{i}.pth'))
+            with self.assertRaises(ValueError):
+                self.ensemble.load_members(paths[:2])
+            self.ensemble.load_members(paths)
+        self.ensemble.set_eval()
+        data = rand((4, 5, 2))
+        prediction = self.ensemble.predict({'input': data})
+        for network in networks:
+            network.set_eval()
+        predictions = stack([network.predict({'input': data})['prediction'] for network in networks])
+        self.assertLess((prediction['prediction'] - predictions.mean(dim=0)).abs().max(), 1e-5)
+        self.assertLess((prediction['variance'] - predictions.var(dim=0, correction=0)).abs().max(), 1e-5)
+
+    def test_optimize(self):
+        # Members are trained through the mean prediction, stacked parameters are updated after the step
+        optimization = self.config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(self.ensemble)
+        data = rand((4, 5, 2))
+        self.ensemble.set_eval()
+        before = self.ensemble.predict({'input': data})['prediction']
+        self.ensemble.set_train()
+        prediction = self.ensemble.predict({'input': data})
+        self.assertTrue(prediction['prediction'].requires_grad)
+        optimization.compute_loss(prediction, {'ground_truth': rand((4, 5, 2))})
+        optimization.optimize()
+        self.ensemble.eval()
+        after = self.ensemble.predict({'input': data})
+        self.assertEqual(after['variance'].dtype, float32)
+        self.assertGreater((after['prediction'] - before).abs().max(), 0)
@@ -1,4 +1,10 @@
+from .tests_TorchBufferPool import TestTorchBufferPool
+from .tests_TorchCheckpointWriter import TestTorchCheckpointWriter
+from .tests_TorchCpuPolicy import TestTorchCpuPolicy
 from .tests_TorchDataTransformation import TestTorchDataTransformation
+from .tests_TorchDistributed import TestTorchDistributed
+from .tests_TorchInferenceServer import TestTorchInferenceServer
 from .tests_TorchNetwork import TestTorchNetwork
 from .tests_TorchNetworkConfig import TestTorchNetworkConfig
 from .tests_TorchOptimization import TestTorchOptimization
+from .tests_TorchSharedParameters import TestTorchSharedParameters
@@ -2,10 +2,16 @@ import unittest
 from os import devnull
 from sys import stdout
 
+from tests_TorchBufferPool import TestTorchBufferPool
+from tests_TorchCheckpointWriter import TestTorchCheckpointWriter
+from tests_TorchCpuPolicy import TestTorchCpuPolicy
 from tests_TorchNetworkConfig import TestTorchNetworkConfig
 from tests_TorchNetwork import TestTorchNetwork
 from tests_TorchOptimization import TestTorchOptimization
 from tests_TorchDataTransformation import TestTorchDataTransformation
+from tests_TorchDistributed import TestTorchDistributed
+from tests_TorchSharedParameters import TestTorchSharedParameters
+from tests_TorchInferenceServer import TestTorchInferenceServer
 
 
 if __name__ == '__main__':
@@ -0,0 +1,43 @@
+from unittest import TestCase
+from torch import device, float32
+from numpy.random import random
+
+from DeepPhysX.Torch.Network.TorchBufferPool import TorchBufferPool
+
+
+class TestTorchBufferPool(TestCase):
+
+    def setUp(self):
+        self.pool = TorchBufferPool(target_device=device('cpu'))
+
+    def test_allocate(self):
+        # Buffers are allocated once for each shape and data type
+        self.pool.allocate((2, 3), 'float32')
+        self.assertEqual(len(self.pool.buffers), 1)
+        self.assertEqual(len(self.pool.buffers[((2, 3), 'float32')]), self.pool.nb_slots)
+        self.pool.allocate((2, 3), 'float32')
+        self.assertEqual(len(self.pool.buffers), 1)
+        self.pool.clear()
+        self.assertEqual(len(self.pool.buffers), 0)
+
+    def test_transfer(self):
+        # Converted tensors share the buffers storage, buffers are reused once their tensor is released
+        data_1, data_2, data_3 = random((2, 3)), random((2, 3)), random((2, 3))
+        tensor_1 = self.pool.transfer(data_1, 'float32')
+        tensor_2 = self.pool.transfer(data_2, 'float32')
+        self.assertEqual(tensor_1.dtype, float32)
+        self.assertNotEqual(tensor_1.data_ptr(), tensor_2.data_ptr())
+        self.assertTrue((tensor_1.numpy() == data_1.astype('float32')).all())
+        pointer_1 = tensor_1.data_ptr()
+        del tensor_1
+        tensor_3 = self.pool.transfer(data_3, 'float32')
+        self.assertEqual(tensor_3.data_ptr(), pointer_1)
+        self.assertTrue((tensor_3.numpy() == data_3.astype('float32')).all())
+        # Buffers in use are not overwritten, a new buffer is allocated
+        tensor_4 = self.pool.transfer(data_1, 'float32')
+        self.assertEqual(len(self.pool.buffers[((2, 3), 'float32')]), 3)
+        self.assertTrue((tensor_2.numpy() == data_2.astype('float32')).all())
+        self.assertTrue((tensor_4.numpy() == data_1.astype('float32')).all())
+        # Gradient flag is not shared between transfers
+        tensor_3.requires_grad_()
+        self.assertFalse(self.pool.transfer(data_1, 'float32').requires_grad)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+from os import listdir, stat, umask
+from os.path import join
+from tempfile import TemporaryDirectory
+from torch import rand, load, equal
+from torch.nn import Linear
+
+from DeepPhysX.Torch.Network.TorchCheckpointWriter import TorchCheckpointWriter
+
+
+class TestTorchCheckpointWriter(TestCase):
+
+    def setUp(self):
+        self.state_dict = {'weight': rand((4, 3)), 'bias': rand(4)}
+
+    def test_save(self):
+        # Saved parameters are a snapshot of the parameters when save is called
+        with TemporaryDirectory() as directory:
+            writer = TorchCheckpointWriter(asynchronous=True, max_pending_saves=2)
+            expected = {key: value.clone() for key, value in self.state_dict.items()}
+            writer.save(self.state_dict, join(directory, 'network_0.pth'))
+            self.state_dict['weight'].zero_()
+            writer.wait()
+            saved = load(join(directory, 'network_0.pth'))
+            for key in expected:
+                self.assertTrue(equal(saved[key], expected[key]))
+            self.assertEqual(listdir(directory), ['network_0.pth'])
+
+    def test_keep_last(self):
+        # Only the last checkpoints are kept
+        with TemporaryDirectory() as directory:
+            writer = TorchCheckpointWriter(asynchronous=True, keep_last=2)
+            for i in range(4):
+                writer.save(self.state_dict, join(directory, f'network_{i}.pth'))
+            writer.wait()
+            self.assertEqual(sorted(listdir(directory)), ['network_2.pth', 'network_3.pth'])
+
+    def test_errors(self):
+        # Errors in background saves are raised on the calling thread
+        writer = TorchCheckpointWriter(asynchronous=True)
+        writer.save(self.state_dict, join('not', 'a', 'directory', 'network.pth'))
+        self.assertRaises(RuntimeError, writer.wait)
+
+    def test_file_mode(self):
+        # Written files get the default permissions instead of the temporary file ones
+        current_umask = umask(0o022)
+        try:
+            with TemporaryDirectory() as directory:
+                writer = TorchCheckpointWriter(asynchronous=False)
+                writer.save(self.state_dict, join(directory, 'network.pth'))
+                self.assertEqual(stat(join(directory, 'network.pth')).st_mode & 0o777, 0o644)
+                self.assertTrue(equal(load(join(directory, 'network.pth'))['weight'], self.state_dict['weight']))
+        finally:
+            umask(current_umask)
+
+    def test_metadata(self):
+        # Saved parameters keep the metadata of the state dict
+        state_dict = Linear(3, 4).state_dict()
+        with TemporaryDirectory() as directory:
+            for asynchronous in [False, True]:
+                writer = TorchCheckpointWriter(asynchronous=asynchronous)
+                writer.save(state_dict, join(directory, 'network.pth'))
+                writer.wait()
+                self.assertEqual(load(join(directory, 'network.pth'))._metadata, state_dict._metadata)
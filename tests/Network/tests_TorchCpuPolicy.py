@@ -0,0 +1,44 @@
+from unittest import TestCase
+from unittest.mock import patch
+from torch import get_num_threads, set_num_threads, rand
+
+from DeepPhysX.Torch.Network.TorchCpuPolicy import TorchCpuPolicy
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+
+
+class TestTorchCpuPolicy(TestCase):
+
+    def setUp(self):
+        self.nb_threads = get_num_threads()
+
+    def tearDown(self):
+        set_num_threads(self.nb_threads)
+
+    def test_apply(self):
+        # Default policy keeps one of the available CPUs free, explicit number of threads is applied
+        nb_cpus = TorchCpuPolicy.available_cpus()
+        self.assertGreaterEqual(nb_cpus, 1)
+        TorchCpuPolicy().apply()
+        self.assertEqual(get_num_threads(), max(1, nb_cpus - 1))
+        TorchCpuPolicy(nb_threads=2).apply()
+        self.assertEqual(get_num_threads(), 2)
+
+    def test_no_affinity(self):
+        # Platforms without CPU affinity (macOS, Windows) fall back on the number of CPUs
+        with patch('os.sched_getaffinity', side_effect=AttributeError, create=True), \
+                patch('os.sched_setaffinity', side_effect=AttributeError, create=True), \
+                patch('os.cpu_count', return_value=3):
+            self.assertLessEqual(TorchCpuPolicy.available_cpus(), 3)
+            TorchCpuPolicy(nb_threads=2, affinity=[0]).apply()
+        self.assertEqual(get_num_threads(), 2)
+
+    def test_auto(self):
+        # Number of threads is tuned on the first prediction in eval mode
+        fc = FCConfig(dim_layers=[10, 10, 10], dim_output=2, cpu_threads='auto').create_network()
+        fc.set_device()
+        self.assertTrue(fc.cpu_policy.tuning_required(training=False))
+        fc.set_eval()
+        fc.predict({'input': rand((4, 10))})
+        self.assertFalse(fc.cpu_policy.tuning_required(training=False))
+        self.assertIn(fc.cpu_policy.nb_threads, fc.cpu_policy.timings)
+        self.assertEqual(get_num_threads(), fc.cpu_policy.nb_threads)
@@ -0,0 +1,186 @@
+from unittest import TestCase
+from os import environ
+from os.path import join, exists
+from tempfile import TemporaryDirectory
+from socket import socket
+from multiprocessing import get_context
+from numpy import allclose
+from numpy.random import random
+from torch import manual_seed, zeros, load
+from torch.nn import MSELoss
+from torch.optim import SGD, Adam
+
+from DeepPhysX.Torch.Network.TorchDistributed import TorchDistributed
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+
+
+def train_step(rank, world_size, port, data, directory, queue, shard_optimizer=False, buffer=False):
+    # Data-parallel optimization step in a process, parameters differ between processes before the broadcast
+    environ.update({'MASTER_ADDR': 'localhost', 'MASTER_PORT': str(port), 'RANK': str(rank),
+                    'WORLD_SIZE': str(world_size), 'LOCAL_RANK': str(rank), 'LOCAL_WORLD_SIZE': str(world_size)})
+    manual_seed(rank)
+    config = FCConfig(dim_layers=[10, 10, 10], dim_output=2, loss=MSELoss, optimizer=Adam if shard_optimizer else SGD,
+                      lr=0.1, distributed='gloo', shard_optimizer=shard_optimizer)
+    fc = config.create_network()
+    if buffer:
+        fc.register_buffer('statistics', zeros(3))
+    fc.set_device()
+    fc.set_train()
+    optimization = config.create_optimization()
+    optimization.set_loss()
+    optimization.set_optimizer(fc)
+    data_net = {'input': fc.numpy_to_tensor(data['input'])}
+    data_opt = {'ground_truth': fc.numpy_to_tensor(data['ground_truth'])}
+    optimization.compute_loss(fc.predict(data_net), data_opt)
+    optimization.optimize()
+    if buffer:
+        # Buffers computed on each shard differ between processes
+        fc.statistics.fill_(rank)
+    fc.save_parameters(join(directory, f'network_{rank}'))
+    parameters = {key: value.detach().numpy() for key, value in fc.state_dict().items()}
+    if shard_optimizer:
+        # Local state only covers a part of the parameters, the whole state is gathered in the main process
+        state = optimization.get_optimizer_state()
+        queue.put((rank, len(optimization.optimizer.optim.state), None if state is None else len(state['state']),
+                   parameters))
+    else:
+        queue.put((rank, data_net['input'].shape[0], parameters))
+    fc.distributed.barrier()
+    fc.distributed.cleanup()
+
+
+class TestTorchDistributed(TestCase):
+
+    def test_shard(self):
+        # Batches are split in contiguous shards, small batches are not split
+        distributed = TorchDistributed()
+        distributed.rank, distributed.world_size = 1, 3
+        self.assertEqual(distributed.shard(random((8, 2))).shape, (3, 2))
+        self.assertEqual(distributed.shard(random((2, 2))).shape, (2, 2))
+        self.assertEqual(distributed.shard_weight, 1.)
+        # Shard weight is the size of the shard relative to an even split
+        self.assertEqual(distributed.shard(random((7, 2))).shape, (2, 2))
+        self.assertAlmostEqual(distributed.shard_weight, 6 / 7)
+
+    def test_train(self):
+        # Processes end with the parameters of a single process trained on the whole batch
+        data = {'input': random((8, 5, 2)), 'ground_truth': random((8, 5, 2))}
+        with socket() as sock:
+            sock.bind(('localhost', 0))
+            port = sock.getsockname()[1]
+        context = get_context('spawn')
+        queue = context.Queue()
+        with TemporaryDirectory() as directory:
+            processes = [context.Process(target=train_step, args=(rank, 2, port, data, directory, queue))
+                         for rank in range(2)]
+            for process in processes:
+                process.start()
+            results = {}
+            for _ in processes:
+                rank, batch_size, parameters = queue.get(timeout=60)
+                results[rank] = (batch_size, parameters)
+            for process in processes:
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+            # Only the main process saves the parameters
+            self.assertTrue(exists(join(directory, 'network_0.pth')))
+            self.assertFalse(exists(join(directory, 'network_1.pth')))
+        self.assertEqual(results[0][0], 4)
+        self.assertEqual(results[1][0], 4)
+
+        # Single process reference
+        manual_seed(0)
+        config = FCConfig(dim_layers=[10, 10, 10], dim_output=2, loss=MSELoss, optimizer=SGD, lr=0.1)
+        fc = config.create_network()
+        fc.set_train()
+        optimization = config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        optimization.compute_loss(fc.predict({'input': fc.numpy_to_tensor(data['input'])}),
+                                  {'ground_truth': fc.numpy_to_tensor(data['ground_truth'])})
+        optimization.optimize()
+        for key, value in fc.state_dict().items():
+            self.assertTrue(allclose(results[0][1][key], results[1][1][key]))
+            self.assertTrue(allclose(results[0][1][key], value.detach().numpy(), atol=1e-6))
+
+    def test_uneven_batch(self):
+        # Uneven shards give the gradients of the whole batch, buffers are averaged before saving
+        data = {'input': random((5, 5, 2)), 'ground_truth': random((5, 5, 2))}
+        with socket() as sock:
+            sock.bind(('localhost', 0))
+            port = sock.getsockname()[1]
+        context = get_context('spawn')
+        queue = context.Queue()
+        with TemporaryDirectory() as directory:
+            processes = [context.Process(target=train_step, args=(rank, 2, port, data, directory, queue, False, True))
+                         for rank in range(2)]
+            for process in processes:
+                process.start()
+            results = {}
+            for _ in processes:
+                rank, batch_size, parameters = queue.get(timeout=60)
+                results[rank] = (batch_size, parameters)
+            for process in processes:
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+            saved = load(join(directory, 'network_0.pth'))
+        self.assertEqual((results[0][0], results[1][0]), (2, 3))
+        self.assertTrue(allclose(saved['statistics'].numpy(), 0.5))
+
+        # Single process reference
+        manual_seed(0)
+        config = FCConfig(dim_layers=[10, 10, 10], dim_output=2, loss=MSELoss, optimizer=SGD, lr=0.1)
+        fc = config.create_network()
+        fc.set_train()
+        optimization = config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        optimization.compute_loss(fc.predict({'input': fc.numpy_to_tensor(data['input'])}),
+                                  {'ground_truth': fc.numpy_to_tensor(data['ground_truth'])})
+        optimization.optimize()
+        for key, value in fc.state_dict().items():
+            self.assertTrue(allclose(results[0][1][key], results[1][1][key]))
+            self.assertTrue(allclose(results[0][1][key], value.detach().numpy(), atol=1e-6))
+
+    def test_shard_optimizer(self):
+        # Sharded optimizer state gives the same update, its state is gathered in the main process
+        with self.assertRaises(ValueError):
+            FCConfig(dim_layers=[10, 10, 10], dim_output=2, shard_optimizer=True)
+        data = {'input': random((8, 5, 2)), 'ground_truth': random((8, 5, 2))}
+        with socket() as sock:
+            sock.bind(('localhost', 0))
+            port = sock.getsockname()[1]
+        context = get_context('spawn')
+        queue = context.Queue()
+        with TemporaryDirectory() as directory:
+            processes = [context.Process(target=train_step, args=(rank, 2, port, data, directory, queue, True))
+                         for rank in range(2)]
+            for process in processes:
+                process.start()
+            results = {}
+            for _ in processes:
+                rank, nb_local_states, nb_states, parameters = queue.get(timeout=60)
+                results[rank] = (nb_local_states, nb_states, parameters)
+            for process in processes:
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+        nb_parameters = 5
+        self.assertLess(results[0][0], nb_parameters)
+        self.assertEqual(results[0][0] + results[1][0], nb_parameters)
+        self.assertEqual(results[0][1], nb_parameters)
+        self.assertIsNone(results[1][1])
+
+        # Single process reference
+        manual_seed(0)
+        config = FCConfig(dim_layers=[10, 10, 10], dim_output=2, loss=MSELoss, optimizer=Adam, lr=0.1)
+        fc = config.create_network()
+        fc.set_train()
+        optimization = config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        optimization.compute_loss(fc.predict({'input': fc.numpy_to_tensor(data['input'])}),
+                                  {'ground_truth': fc.numpy_to_tensor(data['ground_truth'])})
+        optimization.optimize()
+        for key, value in fc.state_dict().items():
+            self.assertTrue(allclose(results[0][2][key], results[1][2][key]))
+            self.assertTrue(allclose(results[0][2][key], value.detach().numpy(), atol=1e-6))
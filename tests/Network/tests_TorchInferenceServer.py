@@ -0,0 +1,76 @@
+from unittest import TestCase
+from threading import Thread
+from multiprocessing import AuthenticationError
+from numpy import allclose
+from numpy.random import random
+from torch import from_numpy
+
+from DeepPhysX.Torch.Network.TorchInferenceServer import TorchInferenceServer, TorchInferenceClient
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+
+
+class TestTorchInferenceServer(TestCase):
+
+    def setUp(self):
+        config = FCConfig(dim_layers=[6, 12, 6], dim_output=3)
+        self.fc = config.create_network()
+        self.server = TorchInferenceServer(network=self.fc, data_transformation=config.create_data_transformation(),
+                                           address=('localhost', 0), authkey=b'tests', max_batch_size=8,
+                                           batch_timeout=0.05)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_predict(self):
+        # Predictions of concurrent clients are batched and equal to the predictions of single samples
+        nb_clients, nb_requests, results = 4, 5, {}
+
+        def run_client(client_id):
+            client = TorchInferenceClient(address=self.server.address, authkey=b'tests')
+            results[client_id] = []
+            for _ in range(nb_requests):
+                sample = {'input': random((2, 3)).astype('float32')}
+                results[client_id].append((sample, client.predict(sample)))
+            client.close()
+
+        threads = [Thread(target=run_client, args=(i,)) for i in range(nb_clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for client_results in results.values():
+            for sample, prediction in client_results:
+                expected = self.fc.predict({'input': from_numpy(sample['input'][None])})['prediction']
+                self.assertTrue(allclose(prediction['prediction'], expected[0].numpy(), atol=1e-6))
+        statistics = self.server.get_statistics()
+        self.assertEqual(statistics['nb_samples'], nb_clients * nb_requests)
+        self.assertGreater(statistics['mean_batch_size'], 1)
+        self.assertLessEqual(statistics['latency_p50'], statistics['latency_p99'])
+
+    def test_errors(self):
+        # Prediction errors are raised by the client
+        client = TorchInferenceClient(address=self.server.address, authkey=b'tests')
+        self.assertRaises(RuntimeError, client.predict, {'input': random((5, 5))})
+        # Malformed requests are refused without stopping the server
+        for sample in [None, {}, {'input': [0., 1., 2.]}]:
+            self.assertRaises(RuntimeError, client.predict, sample)
+        self.assertEqual(client.predict({'input': random((2, 3))})['prediction'].shape, (2, 3))
+        client.close()
+
+    def test_authentication(self):
+        # A random key is generated without authkey, clients without the key are refused
+        config = FCConfig(dim_layers=[6, 6], dim_output=3)
+        server = TorchInferenceServer(network=config.create_network(),
+                                      data_transformation=config.create_data_transformation(),
+                                      address=('localhost', 0))
+        server.start()
+        try:
+            self.assertEqual(len(server.authkey), 32)
+            with self.assertRaises(AuthenticationError):
+                TorchInferenceClient(address=server.address, authkey=b'wrong')
+            client = TorchInferenceClient(address=server.address, authkey=server.authkey)
+            self.assertEqual(client.predict({'input': random((2, 3))})['prediction'].shape, (2, 3))
+            client.close()
+        finally:
+            server.stop()
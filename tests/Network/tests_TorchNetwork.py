@@ -1,8 +1,8 @@
 from unittest import TestCase
-from torch import Tensor
+from torch import Tensor, float32 as float32_t
 from torch.cuda import is_available
 import os
-from numpy import array, float32, ndarray
+from numpy import array, float32, ndarray, zeros
 from numpy.random import random
 
 from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig
@@ -60,3 +60,20 @@ class TestTorchNetwork(TestCase):
         r_data = self.network.transform_to_numpy(t_data)
         self.assertEqual(type(r_data), ndarray)
         self.assertTrue((r_data == n_data).all())
+
+    def test_zero_copy_conversion(self):
+        # Matching data type and layout: memory is shared
+        n_data = random((2, 1, 3)).astype(float32)
+        t_data = self.network.numpy_to_tensor(n_data, grad=False)
+        self.assertEqual(t_data.data_ptr(), n_data.ctypes.data)
+        self.assertEqual(self.network.tensor_to_numpy(t_data).ctypes.data, n_data.ctypes.data)
+        # Different data type: a converted copy is created
+        n_data = random((2, 1, 3))
+        t_data = self.network.numpy_to_tensor(n_data, grad=False)
+        self.assertNotEqual(t_data.data_ptr(), n_data.ctypes.data)
+        self.assertEqual(t_data.dtype, float32_t)
+        # Preallocated output array is filled and returned
+        out = zeros((2, 1, 3), dtype=float32)
+        r_data = self.network.tensor_to_numpy(t_data, out=out)
+        self.assertIs(r_data, out)
+        self.assertTrue((out == n_data.astype(float32)).all())
@@ -1,6 +1,14 @@
 from unittest import TestCase
+from os.path import join
+from tempfile import TemporaryDirectory
+from torch import rand, no_grad
+from torch.nn import MSELoss
+from torch.optim import SGD, Adam
+from torch.optim.lr_scheduler import StepLR, ReduceLROnPlateau
 
 from DeepPhysX.Torch.Network.TorchNetworkConfig import TorchNetworkConfig
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+from DeepPhysX.Torch.FC.FCEnsembleConfig import FCEnsembleConfig
 
 
 class TestTorchOptimization(TestCase):
@@ -17,3 +25,144 @@ class TestTorchOptimization(TestCase):
         self.assertEqual(self.optimization.optimizer_class, None)
         self.assertEqual(self.optimization.optimizer, None)
         self.assertEqual(self.optimization.lr, None)
+        self.assertEqual(self.optimization.accumulation_steps, 1)
+        self.assertEqual(self.optimization.nb_accumulated_steps, 0)
+
+    def test_optimizer_kwargs(self):
+        # Learning rate is only given with lr
+        with self.assertRaises(ValueError):
+            FCConfig(dim_layers=[6, 6], dim_output=3, optimizer_kwargs={'lr': 1e-3})
+        # Parameters with less than two dimensions are not decayed, the fused implementation is used by default
+        config = FCConfig(dim_layers=[6, 6, 6], dim_output=3, loss=MSELoss, optimizer=Adam, lr=1e-1,
+                          optimizer_kwargs={'weight_decay': 1e-2, 'betas': (0.8, 0.9)}, scheduler=StepLR,
+                          scheduler_kwargs={'step_size': 1, 'gamma': 0.5})
+        fc, optimization = config.create_network(), config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        groups = optimization.optimizer.param_groups
+        self.assertEqual([len(group['params']) for group in groups], [2, 3])
+        self.assertEqual([group['weight_decay'] for group in groups], [1e-2, 0.])
+        self.assertEqual(groups[0]['betas'], (0.8, 0.9))
+        self.assertTrue(groups[0]['fused'] or groups[0]['foreach'])
+        # Scheduler is stepped with the optimizer
+        data_pred = fc.predict({'input': rand((4, 2, 3))})
+        optimization.compute_loss(data_pred, {'ground_truth': rand((4, 2, 3))})
+        optimization.optimize()
+        self.assertAlmostEqual(groups[0]['lr'], 5e-2)
+        # Required implementation is kept
+        config = FCConfig(dim_layers=[6, 6], dim_output=3, optimizer=Adam, lr=1e-1, optimizer_kwargs={'foreach': False})
+        optimization = config.create_optimization()
+        optimization.set_optimizer(config.create_network())
+        self.assertFalse(optimization.optimizer.param_groups[0]['foreach'])
+        self.assertFalse(optimization.optimizer.param_groups[0]['fused'])
+
+    def test_plateau_scheduler(self):
+        # Plateau scheduler is only stepped with new reported losses
+        config = FCConfig(dim_layers=[6, 6], dim_output=3, loss=MSELoss, optimizer=SGD, lr=1e-1, loss_report_steps=3,
+                          scheduler=ReduceLROnPlateau, scheduler_kwargs={'patience': 0, 'factor': 0.5})
+        fc, optimization = config.create_network(), config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        for _ in range(6):
+            data_pred = fc.predict({'input': rand((4, 2, 3))})
+            optimization.compute_loss(data_pred, {'ground_truth': rand((4, 2, 3))})
+            optimization.optimize()
+        self.assertEqual(optimization.scheduler.last_epoch, 2)
+        self.assertGreaterEqual(optimization.optimizer.param_groups[0]['lr'], 5e-2)
+
+    def test_gradient_accumulation(self):
+        # Parameters are updated once every accumulation_steps batches
+        config = FCConfig(dim_layers=[6, 6], dim_output=3, loss=MSELoss, optimizer=SGD, lr=1e-1, accumulation_steps=2)
+        fc, optimization = config.create_network(), config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        weight = fc.linear[0].weight.detach().clone()
+        for i in range(2):
+            data_pred = fc.predict({'input': rand((4, 2, 3))})
+            optimization.compute_loss(data_pred, {'ground_truth': rand((4, 2, 3))})
+            optimization.optimize()
+            self.assertEqual(bool((fc.linear[0].weight == weight).all()), i == 0)
+
+    def test_micro_batches(self):
+        # Micro-batches give the same loss and update as the whole batch, for any prediction batch dimension
+        data_net, data_opt = {'input': rand((6, 2, 3))}, {'ground_truth': rand((6, 2, 3))}
+        for config_class in [FCConfig, FCEnsembleConfig]:
+            initial_state, results = None, []
+            for micro_batch_size in [None, 4]:
+                config = config_class(dim_layers=[6, 6], dim_output=3, loss=MSELoss, optimizer=SGD, lr=1e-1,
+                                      micro_batch_size=micro_batch_size)
+                network, optimization = config.create_network(), config.create_optimization()
+                if initial_state is None:
+                    initial_state = {key: value.clone() for key, value in network.state_dict().items()}
+                network.load_state_dict(initial_state)
+                network.set_train()
+                optimization.set_loss()
+                optimization.set_optimizer(network)
+                loss = optimization.compute_loss(network.predict(data_net), data_opt)['loss']
+                optimization.optimize()
+                self.assertIsNone(network.micro_batches)
+                results.append((network.state_dict(), loss))
+            self.assertAlmostEqual(results[0][1], results[1][1], places=5)
+            for key, value in results[0][0].items():
+                self.assertLess((value - results[1][0][key]).abs().max().item(), 1e-6)
+
+    def test_accumulation_loss_report(self):
+        # Mean loss of the accumulated batches is reported, pending gradients are applied before saving
+        config = FCConfig(dim_layers=[6, 6], dim_output=3, loss=MSELoss, optimizer=SGD, lr=1e-1, accumulation_steps=2)
+        fc, optimization = config.create_network(), config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        losses, reported = [], []
+        for _ in range(3):
+            reported.append(optimization.compute_loss(fc.predict({'input': rand((4, 2, 3))}),
+                                                      {'ground_truth': rand((4, 2, 3))})['loss'])
+            losses.append(optimization.loss_value.item())
+            optimization.optimize()
+        self.assertEqual(reported[0], 0.)
+        self.assertAlmostEqual(reported[1], sum(losses[:2]) / 2, places=5)
+        self.assertEqual(optimization.nb_accumulated_steps, 1)
+        weight = fc.linear[0].weight.detach().clone()
+        with TemporaryDirectory() as directory:
+            fc.save_parameters(join(directory, 'network'))
+        self.assertEqual(optimization.nb_accumulated_steps, 0)
+        self.assertFalse(bool((fc.linear[0].weight == weight).all()))
+        self.assertAlmostEqual(optimization.reported_loss, losses[2], places=5)
+        self.assertEqual(optimization.get_loss_statistics()['count'], 2)
+
+    def test_loss_report(self):
+        # Loss values are reported every loss_report_steps steps, statistics include the buffered values
+        optimization = TorchNetworkConfig(loss=MSELoss, loss_report_steps=3).create_optimization()
+        optimization.set_loss()
+        losses, reported = [], []
+        for _ in range(4):
+            loss = optimization.compute_loss({'prediction': rand((4, 3))}, {'ground_truth': rand((4, 3))})['loss']
+            losses.append(optimization.loss_value.item())
+            reported.append(loss)
+        self.assertEqual(reported[:2], [0., 0.])
+        self.assertAlmostEqual(reported[2], sum(losses[:3]) / 3, places=5)
+        self.assertEqual(reported[3], reported[2])
+        statistics = optimization.get_loss_statistics()
+        self.assertEqual(statistics['count'], 4)
+        self.assertAlmostEqual(statistics['mean'], sum(losses) / 4, places=5)
+        self.assertAlmostEqual(statistics['min'], min(losses), places=5)
+        self.assertAlmostEqual(statistics['max'], max(losses), places=5)
+        self.assertEqual(optimization.get_loss_statistics()['count'], 0)
+
+    def test_micro_batches_loss_report(self):
+        # Only the loss of the whole batch is reported, not the losses of the micro-batches
+        config = FCConfig(dim_layers=[6, 6], dim_output=3, loss=MSELoss, optimizer=SGD, lr=1e-1,
+                          micro_batch_size=2, loss_report_steps=2)
+        fc, optimization = config.create_network(), config.create_optimization()
+        optimization.set_loss()
+        optimization.set_optimizer(fc)
+        losses = []
+        for _ in range(3):
+            data_net, data_opt = {'input': rand((6, 2, 3))}, {'ground_truth': rand((6, 2, 3))}
+            with no_grad():
+                losses.append(MSELoss()(fc.predict(data_net)['prediction'], data_opt['ground_truth']).item())
+            optimization.compute_loss(fc.predict(data_net), data_opt)
+            optimization.optimize()
+        self.assertAlmostEqual(optimization.reported_loss, sum(losses[:2]) / 2, places=5)
+        statistics = optimization.get_loss_statistics()
+        self.assertEqual(statistics['count'], 3)
+        self.assertAlmostEqual(statistics['mean'], sum(losses) / 3, places=5)
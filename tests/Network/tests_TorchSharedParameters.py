@@ -0,0 +1,67 @@
+from unittest import TestCase
+from os import getpid
+from os.path import join
+from tempfile import TemporaryDirectory
+from torch import rand, equal
+
+from DeepPhysX.Torch.Network.TorchSharedParameters import TorchSharedParameters
+from DeepPhysX.Torch.FC.FCConfig import FCConfig
+
+
+class TestTorchSharedParameters(TestCase):
+
+    def setUp(self):
+        self.name = f'dpx_tests_{getpid()}'
+        self.publisher = TorchSharedParameters(name=self.name)
+
+    def tearDown(self):
+        self.publisher.unlink()
+
+    def test_publish_attach(self):
+        # Attached parameters are views of the published ones
+        state_dict = {'weight': rand((4, 3)), 'bias': rand(4)}
+        published = self.publisher.publish(state_dict)
+        attached = TorchSharedParameters(name=self.name).attach()
+        for key, value in state_dict.items():
+            self.assertTrue(equal(attached[key], value))
+            self.assertEqual(attached[key].data_ptr() % TorchSharedParameters.ALIGNMENT, 0)
+        published['weight'].zero_()
+        self.assertEqual(attached['weight'].abs().sum().item(), 0)
+        self.assertRaises(FileExistsError, TorchSharedParameters(name=self.name).publish, state_dict)
+        self.assertRaises(FileNotFoundError, TorchSharedParameters(name=f'{self.name}_none').attach)
+
+    def test_load_parameters(self):
+        # Networks loading parameters with the same shared memory name use a single copy of the parameters
+        with TemporaryDirectory() as directory:
+            FCConfig(dim_layers=[10, 10, 10], dim_output=2).create_network().save_parameters(join(directory, 'network'))
+            networks = []
+            for _ in range(2):
+                network = FCConfig(dim_layers=[10, 10, 10], dim_output=2,
+                                   shared_memory_name=self.name).create_network()
+                network.set_eval()
+                network.load_parameters(join(directory, 'network.pth'))
+                networks.append(network)
+        self.publisher = networks[0].shared_parameters
+        self.assertTrue(networks[0].shared_parameters.is_owner)
+        self.assertFalse(networks[1].shared_parameters.is_owner)
+        for key, value in networks[0].state_dict().items():
+            self.assertTrue(equal(networks[1].state_dict()[key], value))
+        networks[0].state_dict()['linear.0.weight'].zero_()
+        self.assertEqual(networks[1].state_dict()['linear.0.weight'].abs().sum().item(), 0)
+
+    def test_source(self):
+        # Parameters published from another file are refused
+        state_dict = {'weight': rand((4, 3))}
+        source = {'path': 'network.pth', 'size': 100, 'mtime': 1}
+        self.publisher.publish(state_dict, source=source)
+        attached = TorchSharedParameters(name=self.name).attach(source=source)
+        self.assertTrue(equal(attached['weight'], state_dict['weight']))
+        shared_parameters = TorchSharedParameters(name=self.name)
+        self.assertRaises(ValueError, shared_parameters.attach, source={**source, 'mtime': 2})
+        self.assertIsNone(shared_parameters.shared_memory)
+        # A network loading another parameters file does not use the published parameters
+        with TemporaryDirectory() as directory:
+            FCConfig(dim_layers=[4, 4], dim_output=1).create_network().save_parameters(join(directory, 'network'))
+            network = FCConfig(dim_layers=[4, 4], dim_output=1, shared_memory_name=self.name).create_network()
+            network.set_eval()
+            self.assertRaises(ValueError, network.load_parameters, join(directory, 'network.pth'))
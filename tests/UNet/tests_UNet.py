@@ -1,7 +1,9 @@
 from unittest import TestCase
-from torch import rand
+from torch import rand, channels_last_3d
+from torch.nn import BatchNorm3d
 
 from DeepPhysX.Torch.UNet.UNetConfig import UNetConfig
+from DeepPhysX.Torch.Network.TorchOnnxNetwork import TorchOnnxExport
 
 
 class TestUNet(TestCase):
@@ -31,3 +33,103 @@ class TestUNet(TestCase):
         # Good input size
         data_t = self.transform.transform_before_prediction(data)
         self.assertEqual(self.unet.forward(data_t).shape, (1, 3, 16, 16, 16))
+
+    def test_fuse(self):
+        # Fused predictions are equivalent to unfused ones
+        unet = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same').create_network()
+        for module in unet.modules():
+            if isinstance(module, BatchNorm3d):
+                module.running_mean.uniform_(-1., 1.)
+                module.running_var.uniform_(0.5, 1.5)
+        data = rand((2, 1, 8, 8, 8))
+        self.assertLess(unet.fuse(sample=data), 1e-4)
+        self.assertTrue(unet.fused)
+        self.assertFalse(unet.training)
+        # Normalization layers are removed
+        self.assertFalse(any(isinstance(module, BatchNorm3d) for module in unet.modules()))
+        self.assertEqual(len(unet.down[0].unet_layer), 4)
+        # Fused Network can be trained
+        unet.set_train()
+        unet.forward(data).sum().backward()
+        self.assertIsNotNone(unet.down[0].unet_layer[0].weight.grad)
+
+    def test_channels_last(self):
+        # Weights, inputs and outputs use the channels last memory format
+        config = UNetConfig(input_size=[8, 8, 8], nb_first_layer_channels=4, nb_steps=2, border_mode='same',
+                            channels_last=True)
+        unet, transform = config.create_network(), config.create_data_transformation()
+        self.assertTrue(unet.down[0].unet_layer[0].weight.is_contiguous(memory_format=channels_last_3d))
+        data_t = transform.transform_before_prediction({'input': rand((2, 8 * 8 * 8))})['input']
+        self.assertTrue(data_t.is_contiguous(memory_format=channels_last_3d))
+        prediction = unet.predict({'input': data_t})
+        self.assertTrue(prediction['prediction'].is_contiguous(memory_format=channels_last_3d))
+        # Permutation back to the data layout is a contiguous view
+        data_out, _ = transform.transform_before_loss(prediction)
+        self.assertTrue(data_out['prediction'].is_contiguous())
+        self.assertEqual(data_out['prediction'].shape, (2, 8, 8, 8, 3))
+
+    def test_skip_merge(self):
+        # Up layers only receive the up-sampled channels
+        config = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same', skip_merge=True)
+        unet = config.create_network()
+        self.assertEqual(unet.up[-1][1].unet_layer[0].in_channels, 4)
+        # Parameters of the former architecture are converted, the channels applied to zeros are removed
+        former_unet = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same').create_network()
+        for _, unet_layer in former_unet.up:
+            weight = unet_layer.unet_layer[0].weight
+            weight.data[:, :weight.shape[1] // 2] = 0.
+        unet.load_state_dict(former_unet.state_dict())
+        unet.eval()
+        former_unet.eval()
+        data = rand((1, 1, 8, 8, 8))
+        self.assertLess((unet.forward(data) - former_unet.forward(data)).abs().max().item(), 1e-5)
+
+    def test_gradient_checkpointing(self):
+        # Wrong levels count
+        with self.assertRaises(ValueError):
+            UNetConfig(nb_steps=2, gradient_checkpointing=[True, False])
+        # Wrong level type
+        with self.assertRaises(TypeError):
+            UNetConfig(nb_steps=2, gradient_checkpointing=[True, 0, False])
+        # Checkpointing is set for each level
+        config = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same',
+                            gradient_checkpointing=[True, False, True])
+        unet = config.create_network()
+        self.assertEqual([unet_layer.checkpoint for unet_layer in unet.down], [True, False, True])
+        self.assertEqual([unet_layer.checkpoint for _, unet_layer in unet.up], [False, True])
+        # Gradients are the same as without checkpointing
+        reference = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same').create_network()
+        reference.load_state_dict(unet.state_dict())
+        data = rand((2, 1, 8, 8, 8))
+        unet.forward(data).sum().backward()
+        reference.forward(data).sum().backward()
+        self.assertLess((unet.down[0].unet_layer[0].weight.grad -
+                         reference.down[0].unet_layer[0].weight.grad).abs().max().item(), 1e-4)
+        # Normalization running statistics are updated once, as without checkpointing
+        for buffer, reference_buffer in zip(unet.buffers(), reference.buffers()):
+            self.assertLess((buffer.double() - reference_buffer.double()).abs().max().item(), 1e-5)
+        self.assertEqual(unet.down[0].unet_layer[1].num_batches_tracked.item(), 1)
+
+    def test_quantize(self):
+        # UNetLayers are statically quantized, predictions remain close to the float ones
+        unet = UNetConfig(nb_first_layer_channels=4, nb_steps=2, border_mode='same').create_network()
+        samples = [rand((1, 1, 8, 8, 8)) for _ in range(4)]
+        self.assertRaises(ValueError, unet.quantize)
+        drift = unet.quantize(samples)
+        self.assertEqual(unet.quantization, 'static')
+        self.assertLess(drift['relative_error'], 5e-2)
+        self.assertFalse(any(isinstance(module, BatchNorm3d) for module in unet.modules()))
+        self.assertEqual(unet.predict({'input': samples[0]})['prediction'].shape, (1, 3, 8, 8, 8))
+        self.assertRaises(ValueError, unet.quantize, samples)
+
+    def test_export_module(self):
+        # Exported module gathers the transformations and the forward pass
+        self.unet.set_eval()
+        module = TorchOnnxExport(network=self.unet, data_transformation=self.transform)
+        data = rand((2, 10 * 10 * 10))
+        prediction = self.transform.transform_before_prediction({'input': data})
+        prediction = self.transform.transform_before_loss(self.unet.predict(prediction))[0]
+        prediction = self.transform.transform_before_apply(prediction)['prediction']
+        self.assertEqual(module.forward(data)[0].shape, prediction.shape)
+        self.assertLess((module.forward(data)[0] - prediction).abs().max().item(), 1e-6)
+        self.assertEqual(module.pred_fields, ['prediction'])
@@ -54,3 +54,31 @@ class TestUNetDataTransformation(TestCase):
         # Check shape and norm
         self.assertEqual(data_t.shape, data.shape)
         self.assertEqual(data_t.norm(), (data / self.transform.data_scale).norm())
+
+    def test_padding_plans(self):
+        # Plans are pre-computed for the input size and the expected grid sizes
+        transform = UNetConfig(input_size=[10, 10, 10], nb_steps=3, border_mode='same',
+                               grid_sizes=[[12, 10, 6]]).create_data_transformation()
+        self.assertEqual(set(transform.padding_plans.keys()), {(10, 10, 10), (6, 10, 12)})
+        # Inputs with another grid shape get their own padding
+        data_t = transform.transform_before_prediction({'input': rand((2, 6, 10, 12, 1))})['input']
+        self.assertEqual(data_t.shape, (2, 1, 8, 16, 16))
+        data_out, data_gt = transform.transform_before_loss({'prediction': rand((2, 3, 8, 16, 16))},
+                                                            {'ground_truth': rand((2, 6 * 10 * 12 * 3))})
+        self.assertEqual(data_out['prediction'].shape, (2, 6, 10, 12, 3))
+        self.assertEqual(data_gt['ground_truth'].shape, (2, 6, 10, 12, 3))
+        # Flat inputs use the input size
+        data_t = transform.transform_before_prediction({'input': rand((2, 1000))})['input']
+        self.assertEqual(data_t.shape, (2, 1, 16, 16, 16))
+        self.assertEqual(len(transform.padding_plans), 2)
+
+    def test_loss_before_prediction(self):
+        # Ground truth uses the input size when no grid was seen yet
+        transform = UNetConfig(input_size=[12, 10, 6], nb_steps=3, border_mode='same').create_data_transformation()
+        _, data_gt = transform.transform_before_loss({'prediction': rand((2, 3, 8, 16, 16))},
+                                                     {'ground_truth': rand((2, 6 * 10 * 12 * 3))})
+        self.assertEqual(data_gt['ground_truth'].shape, (2, 6, 10, 12, 3))
+        # Grid sizes contain 3 positive int
+        for grid_sizes in [[[12, 10]], [[12, 10, 0]], [[12, 10, 6.]], [12, 10, 6]]:
+            with self.assertRaises(ValueError):
+                UNetConfig(input_size=[12, 10, 6], grid_sizes=grid_sizes)